@@ -1,10 +1,16 @@
-from flask import Flask, jsonify
+from flask import Flask, Request, jsonify, request, g
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
-from pymongo import MongoClient
+from flask_jwt_extended import JWTManager, verify_jwt_in_request
 import os
+import time
 import logging
 from config import config
+from utils.metrics import REQUEST_SECONDS
+from utils.profiler import cpu_profiler
+from utils import tracing
+from models.schema import ensure_indexes
+from utils.write_behind import WriteBehindQueue
+from utils.mongo import ForkSafeDatabase
 
 # Setup logging
 logging.basicConfig(
@@ -13,12 +19,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def create_app():
+class AppRequest(Request):
+    # Endpoints allowed a larger body than MAX_CONTENT_LENGTH
+    body_limits = {"documents.upload_documents_bulk": lambda: config.BULK_MAX_UPLOAD_BYTES}
+
+    @property
+    def max_content_length(self):
+        limit = self.body_limits.get(self.endpoint)
+        return limit() if limit else super().max_content_length
+
+def start_background_tasks(app):
+    """Start this process's periodic background threads (see BACKGROUND_TASKS_START)."""
+    from utils.stats import ensure_reconciler
+    ensure_reconciler(app.db)
+
+def create_app(db=None):
     app = Flask(__name__)
+    app.request_class = AppRequest
+    if config.TRUSTED_PROXY_COUNT:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXY_COUNT,
+                                x_proto=config.TRUSTED_PROXY_COUNT)
     
     # Config
     app.config['JWT_SECRET_KEY'] = config.JWT_SECRET
     app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
+    # Only /documents/events also accepts ?jwt= (see its decorator)
+    app.config['JWT_TOKEN_LOCATION'] = ['headers']
     
     # CORS
     CORS(app, origins=[
@@ -30,22 +57,34 @@ def create_app():
     jwt = JWTManager(app)
     
     # MongoDB
-    client = MongoClient(config.MONGO_URI)
-    db = client.get_default_database()
+    if db is None:
+        db = ForkSafeDatabase(config.MONGO_URI)
     app.db = db
+    app.write_behind = WriteBehindQueue(db)
     
     # Create indexes
     try:
-        db.users.create_index("email", unique=True)
-        db.users.create_index("username", unique=True)
-        db.documents.create_index("user_id")
-        db.document_chunks.create_index("document_id")
-        db.chat_sessions.create_index("user_id")
-        db.messages.create_index("session_id")
-        logger.info("MongoDB indexes created successfully")
+        ensure_indexes(db)
     except Exception as e:
         logger.warning(f"Index creation warning: {e}")
     
+    # Embedding model lifecycle
+    if config.EMBEDDING_WARMUP != "off":
+        from utils.embeddings import warm_up
+        from utils.embedding_versions import get_active_model
+        try:
+            model_name = get_active_model(db)
+        except Exception as e:
+            logger.warning(f"Could not read the active embedding model ({e}); warming {config.EMBEDDING_MODEL}")
+            model_name = config.EMBEDDING_MODEL
+        try:
+            warm_up(encode=config.EMBEDDING_WARMUP == "full", model_name=model_name)
+        except Exception as e:
+            logger.error(f"Embedding model warm-up failed: {e}")
+    
+    if config.BACKGROUND_TASKS_START == "create_app":
+        start_background_tasks(app)
+    
     # Ensure uploads dir
     os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
     
@@ -63,7 +102,58 @@ def create_app():
     # Health check
     @app.route('/health')
     def health():
-        return jsonify({"status": "ok", "message": "Knowledge Assistant API running"})
+        from utils.embeddings import is_ready
+        model_ready = is_ready()
+        if config.EMBEDDING_WARMUP != "off" and not model_ready:
+            return jsonify({"status": "starting", "model_ready": False}), 503
+        return jsonify({
+            "status": "ok",
+            "message": "Knowledge Assistant API running",
+            "model_ready": model_ready
+        })
+    
+    # Metrics
+    @app.route('/metrics')
+    def metrics():
+        from utils.metrics import render_metrics
+        body, content_type = render_metrics()
+        return body, 200, {"Content-Type": content_type}
+    
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        if tracing.enabled() and request.endpoint not in ("metrics", "health"):
+            g.trace_span = tracing.start_span(
+                f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                {"http.method": request.method, "http.target": request.path},
+                root=True
+            )
+            if "Authorization" in request.headers:
+                # Decoded again by the view's decorator; only paid while tracing
+                with tracing.span("auth"):
+                    try:
+                        verify_jwt_in_request(optional=True)
+                    except Exception:
+                        pass
+    
+    @app.after_request
+    def record_request(response):
+        start = g.pop("request_start", None)
+        if start is not None and request.endpoint != "metrics":
+            REQUEST_SECONDS.labels(
+                request.endpoint or "unknown", request.method, response.status_code
+            ).observe(time.perf_counter() - start)
+        root = g.get("trace_span")
+        if root is not None:
+            root.set_attribute("http.status_code", response.status_code)
+        cpu_profiler.note_request()
+        return response
+    
+    @app.teardown_request
+    def finish_trace(error=None):
+        root = g.pop("trace_span", None)
+        if root is not None:
+            tracing.end_span(root, error)
     
     # JWT error handlers
     @jwt.expired_token_loader
@@ -81,7 +171,7 @@ def create_app():
     # Global error handler
     @app.errorhandler(413)
     def file_too_large(e):
-        return jsonify({"error": "File too large. Max size is 16MB"}), 413
+        return jsonify({"error": f"Upload too large. Max size is {request.max_content_length // (1024 * 1024)}MB"}), 413
     
     @app.errorhandler(500)
     def internal_error(e):
@@ -0,0 +1,64 @@
+# benchmarks/compare.py
+"""Diff two benchmark result files.
+
+    python -m benchmarks.compare results/base.json results/head.json [--threshold 10]
+
+Prints per-scenario throughput and latency deltas and exits with status 1
+when any p95 regresses by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"]
+
+def _delta(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+def compare(base, head, threshold):
+    regressions = []
+    lines = [f"{'scenario':16s} {'metric':15s} {'base':>10s} {'head':>10s} {'change':>9s}"]
+    for name in sorted(set(base["scenarios"]) | set(head["scenarios"])):
+        old, new = base["scenarios"].get(name), head["scenarios"].get(name)
+        if old is None or new is None:
+            lines.append(f"{name:16s} only in {'head' if old is None else 'base'}")
+            continue
+        for metric in METRICS:
+            change = _delta(old[metric], new[metric])
+            shown = f"{change:+8.1f}%" if change is not None else f"{'n/a':>9s}"
+            lines.append(f"{name:16s} {metric:15s} {old[metric]:10.2f} {new[metric]:10.2f} {shown}")
+            if metric == "p95_ms" and change is not None and change > threshold:
+                regressions.append(f"{name} p95 {change:+.1f}%")
+        for stage in sorted(set(old.get("stages", {})) | set(new.get("stages", {}))):
+            o = old.get("stages", {}).get(stage, {}).get("mean_ms", 0.0)
+            n = new.get("stages", {}).get(stage, {}).get("mean_ms", 0.0)
+            change = _delta(o, n)
+            shown = f"{change:+8.1f}%" if change is not None else f"{'n/a':>9s}"
+            lines.append(f"{name:16s} {'  ' + stage:15s} {o:10.3f} {n:10.3f} {shown}")
+    return lines, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    if base.get("params") != head.get("params"):
+        print(f"Warning: parameters differ\n  base: {base.get('params')}\n  head: {head.get('params')}")
+    print(f"base {base.get('git_sha')} ({base.get('timestamp')})  vs  head {head.get('git_sha')} ({head.get('timestamp')})")
+
+    lines, regressions = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
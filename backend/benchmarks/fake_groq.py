@@ -0,0 +1,118 @@
+# benchmarks/fake_groq.py
+"""Local stand-in for the Groq chat completions API.
+
+Serves POST /openai/v1/chat/completions with a fixed latency (plus optional
+jitter) and supports `stream: true` as server-sent events. Point the app at
+it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+    python -m benchmarks.fake_groq --port 8088 --latency-ms 400
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("Based on the provided documents, the report covers quarterly revenue, "
+          "operating costs and the outlook for the next period. (Source 1)")
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    latency_ms = 300
+    jitter_ms = 50
+    tokens_per_second = 400
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+        max_tokens = body.get("max_tokens") or 1024
+        words = ANSWER.split()[:max_tokens]
+        completion_tokens = len(words)
+
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if body.get("stream"):
+            self._stream(completion_id, body.get("model"), words, usage)
+            return
+
+        payload = json.dumps({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, completion_id, model, words, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+            }
+            if i == len(words) - 1:
+                chunk["choices"][0]["finish_reason"] = "stop"
+                chunk["x_groq"] = {"usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+def start_server(port=0, latency_ms=300, jitter_ms=50, tokens_per_second=400):
+    """Start in a daemon thread; returns (server, base_url)."""
+    handler = type("Handler", (FakeGroqHandler,), {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "tokens_per_second": tokens_per_second
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    args = parser.parse_args()
+    server, url = start_server(args.port, args.latency_ms, args.jitter_ms, args.tokens_per_second)
+    print(f"Fake Groq listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/loadgen.py
+"""Closed-loop concurrent load generator with latency percentiles."""
+import threading
+import time
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def summarize(latencies_ms, errors, elapsed):
+    values = sorted(latencies_ms)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count, 2) if count else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0
+    }
+
+def run_load(make_worker, concurrency, total_requests, warmup=0):
+    """Run `total_requests` calls spread over `concurrency` threads.
+
+    `make_worker(index)` is called once per thread and returns a callable
+    `fn(i) -> bool` (True on success). The first `warmup` calls are not
+    recorded.
+    """
+    lock = threading.Lock()
+    counter = {"next": 0}
+    latencies, errors = [], [0]
+
+    def next_index():
+        with lock:
+            i = counter["next"]
+            counter["next"] += 1
+            return i
+
+    def loop(worker_index):
+        fn = make_worker(worker_index)
+        local, local_errors = [], 0
+        while True:
+            i = next_index()
+            if i >= total_requests + warmup:
+                break
+            start = time.perf_counter()
+            try:
+                ok = fn(i)
+            except Exception:
+                ok = False
+            duration = (time.perf_counter() - start) * 1000
+            if i < warmup:
+                continue
+            if ok:
+                local.append(duration)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=loop, args=(w,), daemon=True) for w in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
@@ -0,0 +1,272 @@
+# benchmarks/run.py
+"""End-to-end benchmark suite.
+
+Seeds a database with synthetic data, starts the fake Groq server, builds
+the app in-process and drives the HTTP endpoints with a concurrent load
+generator. Results (throughput, p50/p95/p99 and per-stage breakdown from
+ka_stage_seconds) are written to benchmarks/results/<timestamp>-<sha>.json;
+diff two runs with `python -m benchmarks.compare`.
+
+Usage (from backend/):
+    python -m benchmarks.run --mongomock --chunks 1000
+    python -m benchmarks.run --mongo-uri mongodb://localhost:27017/ka_bench \\
+        --chunks 100000 --concurrency 16 --requests 500 --scenarios ask,list_sessions
+
+Never point --mongo-uri at a real database: the seed step drops collections.
+--mongomock needs `pip install mongomock` (not a runtime dependency).
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from benchmarks.loadgen import run_load
+from benchmarks.seed import PASSWORD
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCENARIOS = ["ask", "upload", "bulk_upload", "list_documents", "list_sessions", "get_session",
+             "session_export", "admin_users", "admin_documents", "admin_stats", "login_storm"]
+
+def _git_sha():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def stage_snapshot():
+    """{stage: (sum_seconds, count)} from the in-process stage histogram."""
+    from utils.metrics import STAGE_SECONDS
+    snapshot = {}
+    for family in STAGE_SECONDS.collect():
+        for sample in family.samples:
+            stage = sample.labels.get("stage")
+            total, count = snapshot.get(stage, (0.0, 0))
+            if sample.name.endswith("_sum"):
+                total = sample.value
+            elif sample.name.endswith("_count"):
+                count = int(sample.value)
+            snapshot[stage] = (total, count)
+    return snapshot
+
+def stage_breakdown(before, after):
+    breakdown = {}
+    for stage, (total, count) in after.items():
+        prev_total, prev_count = before.get(stage, (0.0, 0))
+        calls = count - prev_count
+        if calls:
+            breakdown[stage] = {
+                "calls": calls,
+                "total_ms": round((total - prev_total) * 1000, 2),
+                "mean_ms": round((total - prev_total) * 1000 / calls, 3)
+            }
+    return breakdown
+
+def connect(args):
+    if args.mongomock:
+        import mongomock
+        return mongomock.MongoClient().get_database("ka_bench")
+    from pymongo import MongoClient
+    return MongoClient(args.mongo_uri).get_default_database()
+
+def build_requests(app, seeded, args):
+    """Return {scenario: make_worker} closures over a per-thread test client."""
+    from flask_jwt_extended import create_access_token
+
+    users = seeded["users"]
+    with app.app_context():
+        tokens = [create_access_token(identity=u["id"]) for u in users]
+    admin_headers = {"Authorization": f"Bearer {tokens[0]}"}
+    upload_body = ("Benchmark upload. " * 400).encode("utf-8")
+
+    def headers_for(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    def sessions_for(i):
+        db = app.db
+        uid = users[i % len(users)]["id"]
+        long_session = seeded["long_sessions"].get(uid)
+        if long_session:
+            return long_session
+        session = db.chat_sessions.find_one({"user_id": uid}, {"_id": 1})
+        return str(session["_id"]) if session else None
+
+    def get(path, headers):
+        def make_worker(w):
+            client = app.test_client()
+            return lambda i: client.get(path, headers=headers(i) if callable(headers) else headers).status_code == 200
+        return make_worker
+
+    def ask_worker(w):
+        client = app.test_client()
+        def call(i):
+            body = {"question": f"What does report {i % args.distinct_questions} say about revenue?"}
+            return client.post("/chat/ask", json=body, headers=headers_for(i)).status_code == 200
+        return call
+
+    def upload_worker(w):
+        client = app.test_client()
+        def call(i):
+            data = {"file": (io.BytesIO(upload_body), f"bench-upload-{i}.txt")}
+            return client.post("/documents/upload", data=data, headers=headers_for(i),
+                               content_type="multipart/form-data").status_code == 201
+        return call
+
+    def bulk_upload_worker(w):
+        client = app.test_client()
+        def call(i):
+            data = {"files": [(io.BytesIO(upload_body), f"bench-bulk-{i}-{n}.txt") for n in range(args.bulk_files)]}
+            return client.post("/documents/upload/bulk", data=data, headers=headers_for(i),
+                               content_type="multipart/form-data").status_code == 201
+        return call
+
+    def login_worker(w):
+        client = app.test_client()
+        def call(i):
+            body = {"email": users[i % len(users)]["email"], "password": PASSWORD}
+            return client.post("/auth/login", json=body).status_code == 200
+        return call
+
+    def get_session_worker(w):
+        client = app.test_client()
+        def call(i):
+            session_id = sessions_for(i)
+            return client.get(f"/chat/sessions/{session_id}", headers=headers_for(i)).status_code == 200
+        return call
+
+    def export_worker(w):
+        client = app.test_client()
+        def call(i):
+            session_id = sessions_for(i)
+            response = client.get(f"/chat/sessions/{session_id}/export", headers=headers_for(i))
+            response.get_data()  # drain the stream
+            return response.status_code == 200
+        return call
+
+    return {
+        "ask": ask_worker,
+        "upload": upload_worker,
+        "bulk_upload": bulk_upload_worker,
+        "list_documents": get("/documents/list", headers_for),
+        "list_sessions": get("/chat/sessions", headers_for),
+        "get_session": get_session_worker,
+        "session_export": export_worker,
+        "admin_users": get("/admin/users", admin_headers),
+        "admin_documents": get("/admin/documents", admin_headers),
+        "admin_stats": get("/admin/stats", admin_headers),
+        "login": login_worker
+    }
+
+def run_login_storm(workers, args):
+    """Login at full concurrency while measuring /chat/ask latency alongside."""
+    background = {}
+    storm = threading.Thread(target=lambda: background.update(
+        login=run_load(workers["login"], args.concurrency, args.requests, args.warmup)
+    ))
+    storm.start()
+    ask = run_load(workers["ask"], max(1, args.concurrency // 2), max(1, args.requests // 2))
+    storm.join()
+    return {"login_storm": background["login"], "ask_during_login_storm": ask}
+
+def report_line(name, summary):
+    print(f"{name:24s} {summary['throughput_rps']:8.1f} req/s  p50 {summary['p50_ms']:8.1f}ms  "
+          f"p95 {summary['p95_ms']:8.1f}ms  p99 {summary['p99_ms']:8.1f}ms  errors {summary['errors']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Knowledge assistant benchmark suite")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/ka_bench"))
+    source.add_argument("--mongomock", action="store_true", help="Use in-memory mongomock instead of mongod")
+    parser.add_argument("--chunks", type=int, default=1000, help="Total chunks to seed (1k to 1M)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--long-session-messages", type=int, default=1000,
+                        help="Messages in each user's first session (opened by get_session)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse previously seeded data")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--distinct-questions", type=int, default=50)
+    parser.add_argument("--bulk-files", type=int, default=20, help="Files per bulk_upload request")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<sha>.json)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from benchmarks.fake_groq import start_server
+    groq_server, groq_url = start_server(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+
+    from config import config
+    config.GROQ_BASE_URL = groq_url
+    config.GROQ_API_KEY = config.GROQ_API_KEY or "benchmark"
+
+    db = connect(args)
+    from benchmarks.seed import seed
+    if args.skip_seed:
+        seeded = {
+            "users": [{"id": str(u["_id"]), "email": u["email"]}
+                      for u in db.users.find({"email": {"$regex": "^bench"}}).sort("username", 1)],
+            "long_sessions": {}
+        }
+    else:
+        start = time.perf_counter()
+        seeded = seed(db, users=args.users, chunks=args.chunks,
+                      long_session_messages=args.long_session_messages)
+        print(f"Seeded {args.chunks} chunks in {time.perf_counter() - start:.1f}s")
+
+    from app import create_app
+    app = create_app(db)
+    workers = build_requests(app, seeded, args)
+
+    results = {}
+    for name in scenarios:
+        before = stage_snapshot()
+        if name == "login_storm":
+            summaries = run_login_storm(workers, args)
+        else:
+            summaries = {name: run_load(workers[name], args.concurrency, args.requests, args.warmup)}
+        stages = stage_breakdown(before, stage_snapshot())
+        for result_name, summary in summaries.items():
+            summary["stages"] = stages
+            results[result_name] = summary
+            report_line(result_name, summary)
+
+    app.write_behind.flush(timeout=10)
+    groq_server.shutdown()
+
+    sha = _git_sha()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {
+        "git_sha": sha,
+        "timestamp": stamp,
+        "python": sys.version.split()[0],
+        "params": {
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "chunks": args.chunks,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "llm_latency_ms": args.llm_latency_ms,
+            "embedding_backend": config.EMBEDDING_BACKEND,
+            "bcrypt_rounds": config.BCRYPT_ROUNDS,
+            "password_hash_workers": config.PASSWORD_HASH_WORKERS
+        },
+        "scenarios": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{stamp}-{sha}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/seed.py
+"""Seed MongoDB with synthetic users, documents, chunks and conversations."""
+import random
+from datetime import datetime, timezone, timedelta
+import bcrypt
+from bson import ObjectId
+from config import config
+from models.user import create_user
+from models.document import create_document, create_chunk
+from models.chat import create_session, create_message
+from utils.stats import reconcile_stats
+
+PASSWORD = "benchmark"
+WORDS = ("quarterly revenue growth policy employee onboarding contract security "
+         "incident budget forecast product launch roadmap customer retention "
+         "infrastructure migration compliance audit report summary").split()
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _vector(rng, dim):
+    v = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(x * x for x in v) ** 0.5 or 1.0
+    return [x / norm for x in v]
+
+def _flush(collection, docs, force=False, batch=1000):
+    if docs and (force or len(docs) >= batch):
+        collection.insert_many(docs, ordered=False)
+        docs.clear()
+
+def seed(db, users=10, chunks=1000, docs_per_user=5, sessions_per_user=5,
+         messages_per_session=20, long_session_messages=0, dim=384, seed_value=42, drop=True):
+    """Create a synthetic corpus; returns {"users": [{"id", "email"}], "sessions": {...}}."""
+    rng = random.Random(seed_value)
+    if drop:
+        for name in ("users", "documents", "document_chunks", "chat_sessions", "messages", "stats", "settings"):
+            db[name].drop()
+
+    # Cheap hash: seeding speed matters, login benchmarks rehash on first login anyway
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+    chunks_per_doc = max(1, chunks // max(1, users * docs_per_user))
+    now = datetime.now(timezone.utc)
+
+    seeded = {"users": [], "long_sessions": {}}
+    chunk_buffer, message_buffer = [], []
+    for u in range(users):
+        user = create_user(f"bench{u}", f"bench{u}@example.com", hashed, "admin" if u == 0 else "user")
+        user_id = db.users.insert_one(user).inserted_id
+        uid = str(user_id)
+        seeded["users"].append({"id": uid, "email": user["email"]})
+
+        docs = []
+        for d in range(docs_per_user):
+            doc = create_document(uid, f"bench-{u}-{d}.txt", f"Benchmark report {u}-{d}.txt", "txt", 4096)
+            doc.update(status="ready", chunk_count=chunks_per_doc, created_at=now - timedelta(minutes=d))
+            docs.append(doc)
+        doc_ids = db.documents.insert_many(docs).inserted_ids
+
+        for doc_id in doc_ids:
+            for i in range(chunks_per_doc):
+                chunk_buffer.append(create_chunk(
+                    str(doc_id), uid, _text(rng, 120), i,
+                    embedding=_vector(rng, dim),
+                    is_active=True,
+                    embedding_model=config.EMBEDDING_MODEL
+                ))
+                _flush(db.document_chunks, chunk_buffer)
+
+        for s in range(sessions_per_user):
+            count = long_session_messages if (s == 0 and long_session_messages) else messages_per_session
+            session = create_session(uid, f"Benchmark session {s}")
+            session["message_count"] = count
+            session_id = str(db.chat_sessions.insert_one(session).inserted_id)
+            if s == 0 and long_session_messages:
+                seeded["long_sessions"][uid] = session_id
+            for m in range(count):
+                role = "user" if m % 2 == 0 else "assistant"
+                message = create_message(session_id, uid, role, _text(rng, 40 if role == "user" else 150),
+                                         sources=[] if role == "user" else [{
+                                             "document_name": "Benchmark report",
+                                             "document_id": str(doc_ids[0]),
+                                             "similarity_score": 0.8,
+                                             "excerpt": _text(rng, 30)
+                                         } for _ in range(5)])
+                message["_id"] = ObjectId()
+                message["created_at"] = now - timedelta(seconds=count - m)
+                message_buffer.append(message)
+                _flush(db.messages, message_buffer)
+
+    _flush(db.document_chunks, chunk_buffer, force=True)
+    _flush(db.messages, message_buffer, force=True)
+    reconcile_stats(db)
+    return seeded
@@ -7,19 +7,127 @@ class Config:
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/knowledge_assistant")
     JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secret")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "")  # e.g. benchmarks/fake_groq.py
     FLASK_ENV = os.getenv("FLASK_ENV", "development")
     FLASK_PORT = int(os.getenv("FLASK_PORT", 5000))
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
+    # /documents/upload/bulk: request size, file count, uncompressed total and ZIP ratio guards
+    BULK_MAX_UPLOAD_BYTES = int(os.getenv("BULK_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+    BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", 500))
+    BULK_MAX_TOTAL_BYTES = int(os.getenv("BULK_MAX_TOTAL_BYTES", 500 * 1024 * 1024))
+    BULK_MAX_COMPRESSION_RATIO = int(os.getenv("BULK_MAX_COMPRESSION_RATIO", 100))
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
 
     # Chunking
-    CHUNK_SIZE = 500
-    CHUNK_OVERLAP = 50
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))
+    # "content": content-defined boundaries that survive edits (see utils/chunker.py); "fixed": every CHUNK_SIZE words
+    CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "content")
     TOP_K_CHUNKS = 5
+    # Extracted text is kept compressed (utils/text_store.py) for rechunking
+    TEXT_ZSTD_LEVEL = int(os.getenv("TEXT_ZSTD_LEVEL", 9))
 
     # Models
     GROQ_MODEL = "llama-3.1-8b-instant"   # free & fast on Groq
-    EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # free local embeddings
+    # Default/initial model; the active model is tracked in the settings collection
+    # and changed with a background re-embed (see utils/embedding_versions.py)
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # free local embeddings
+    ACTIVE_MODEL_CACHE_TTL = int(os.getenv("ACTIVE_MODEL_CACHE_TTL", 10))
+    REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", 256))
+    REEMBED_PAUSE_MS = int(os.getenv("REEMBED_PAUSE_MS", 200))
+    # Admin jobs (re-embed, rechunk) hold an expiring lease; a dead owner's job can be taken over
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 120))
+    JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", 15))
+    # Rechunking stored text (POST /admin/documents/rechunk)
+    RECHUNK_WORKERS = int(os.getenv("RECHUNK_WORKERS", 2))
+    RECHUNK_PAUSE_MS = int(os.getenv("RECHUNK_PAUSE_MS", 200))
+    # full: load + warm-up encode at app creation | load: weights only | off: lazy
+    EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "full")
+    # torch (sentence-transformers) | onnx (onnxruntime; export first with
+    # `python -m scripts.onnx_export`, serving does not export).
+    # ONNX vectors stay within cosine 0.999 (fp32) / 0.98 (int8) of torch;
+    # check with `python -m scripts.onnx_benchmark`.
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")  # one subdir per model
+    EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "true").lower() == "true"
+
+    # Embedding worker role: "host:port" or a unix socket path; empty encodes in-process
+    EMBEDDING_SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", "")
+    # Required for a TCP address; must not reuse JWT_SECRET (see utils/embedding_client.py)
+    EMBEDDING_SERVICE_AUTHKEY = os.getenv("EMBEDDING_SERVICE_AUTHKEY", "")
+    EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", 30))  # seconds per encode reply
+    EMBEDDING_LOCAL_FALLBACK = os.getenv("EMBEDDING_LOCAL_FALLBACK", "false").lower() == "true"
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+    EMBEDDING_BATCH_WAIT_MS = int(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5))
     MAX_TOKENS = 1024
 
-config = Config()
\ No newline at end of file
+    # Write-behind for /chat/ask bookkeeping (seconds / ops)
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.25))
+    WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 10000))
+
+    # Tracing: OTLP/JSON lines appended to this file (empty disables)
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "knowledge-assistant")
+    TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 1000))  # always keep slower traces
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))
+
+    # Admin stats drift correction (seconds, 0 disables)
+    STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", 3600))
+    # Where per-process background threads start: "create_app", or "post_fork" when
+    # gunicorn preloads the app in the master (set by gunicorn.conf.py)
+    BACKGROUND_TASKS_START = os.getenv("BACKGROUND_TASKS_START", "create_app")
+
+    # Admin listings: user ID -> display fields cache
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    # Upper bound on how long a disabled/demoted admin keeps access on other workers
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 30))
+
+    # /chat/ask conversation context: recent messages kept per session, and sessions kept
+    CONTEXT_CACHE_TURNS = int(os.getenv("CONTEXT_CACHE_TURNS", 10))
+    CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", 5000))
+
+    # Document status stream: "memory" (single process) or "changestream" (replica set).
+    # gunicorn.conf.py switches the default to changestream when it runs several workers.
+    DOCUMENT_EVENTS_BACKEND = os.getenv("DOCUMENT_EVENTS_BACKEND", "memory")
+    # Open streams per process; each holds a request thread, so past this clients get 503 and poll
+    DOCUMENT_EVENTS_MAX_STREAMS = int(os.getenv(
+        "DOCUMENT_EVENTS_MAX_STREAMS", max(1, int(os.getenv("GUNICORN_THREADS", 4)) // 4)
+    ))
+    DOCUMENT_EVENTS_QUEUE_SIZE = int(os.getenv("DOCUMENT_EVENTS_QUEUE_SIZE", 100))
+    DOCUMENT_EVENTS_HEARTBEAT = int(os.getenv("DOCUMENT_EVENTS_HEARTBEAT", 15))
+    # Streams end after this long; EventSource reconnects on its own
+    DOCUMENT_EVENTS_MAX_AGE = int(os.getenv("DOCUMENT_EVENTS_MAX_AGE", 300))
+    # Documents finished this recently are replayed when a stream (re)connects
+    DOCUMENT_EVENTS_SNAPSHOT_WINDOW = int(os.getenv("DOCUMENT_EVENTS_SNAPSHOT_WINDOW", 2 * DOCUMENT_EVENTS_MAX_AGE))
+    # Chunks per embedding call during ingestion (one progress event each)
+    INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", 256))
+
+    # Password hashing (0 workers = hash on the request thread)
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", 5))
+    LOGIN_IP_MAX_ATTEMPTS = int(os.getenv("LOGIN_IP_MAX_ATTEMPTS", 50))
+    LOGIN_ATTEMPT_WINDOW = int(os.getenv("LOGIN_ATTEMPT_WINDOW", 300))
+    # Reverse proxies in front of the app; the client address is taken from X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+    # Without TRUSTED_PROXY_COUNT behind a proxy every client shares one address, so the
+    # per-IP limit is on by default only when the proxy count is set
+    LOGIN_IP_LIMIT_ENABLED = os.getenv(
+        "LOGIN_IP_LIMIT_ENABLED", "true" if TRUSTED_PROXY_COUNT else "false"
+    ).lower() == "true"
+
+    # List endpoints
+    PAGINATION_MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", 100))
+    PAGINATION_COUNT_TTL = int(os.getenv("PAGINATION_COUNT_TTL", 30))
+
+config = Config()
+
+# A bad chunk setting would otherwise only show up as a hung or empty upload
+if not 0 <= config.CHUNK_OVERLAP < config.CHUNK_SIZE:
+    raise ValueError(f"CHUNK_OVERLAP must be at least 0 and less than CHUNK_SIZE "
+                     f"(got CHUNK_SIZE={config.CHUNK_SIZE}, CHUNK_OVERLAP={config.CHUNK_OVERLAP})")
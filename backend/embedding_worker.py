@@ -0,0 +1,146 @@
+# embedding_worker.py
+"""Standalone embedding worker.
+
+Serves encode requests from the API tier over a local socket and batches
+concurrent requests into shared model calls. Run one per embedding node:
+
+    EMBEDDING_SERVICE_ADDRESS=/tmp/ka-embed.sock python embedding_worker.py
+
+and point the Flask app at the same EMBEDDING_SERVICE_ADDRESS. Without that
+setting the app keeps encoding in-process. A host:port address also needs
+the same dedicated EMBEDDING_SERVICE_AUTHKEY on both sides.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener
+from config import config
+from utils.embedding_client import parse_address, recv_message, send_message, service_authkey
+from utils.embeddings import encode_local, warm_up
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class _Pending:
+    def __init__(self, texts, model_name):
+        self.texts = texts
+        self.model_name = model_name
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class BatchingEncoder:
+    """Merge requests that arrive within EMBEDDING_BATCH_WAIT_MS into one encode call."""
+
+    def __init__(self, max_batch=None, wait_ms=None):
+        self.max_batch = max_batch or config.EMBEDDING_BATCH_SIZE
+        self.wait = (wait_ms if wait_ms is not None else config.EMBEDDING_BATCH_WAIT_MS) / 1000
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def encode(self, texts, model_name=None):
+        pending = _Pending(texts, model_name)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.texts)
+            by_model = {}
+            for pending in batch:
+                by_model.setdefault(pending.model_name, []).append(pending)
+            for model_name, group in by_model.items():
+                try:
+                    embeddings = encode_local([t for p in group for t in p.texts], self.max_batch, model_name)
+                    offset = 0
+                    for pending in group:
+                        pending.result = embeddings[offset:offset + len(pending.texts)]
+                        offset += len(pending.texts)
+                except Exception as e:
+                    logger.error(f"Encode failed for batch of {size} texts: {e}")
+                    for pending in group:
+                        pending.error = e
+                finally:
+                    for pending in group:
+                        pending.done.set()
+
+def serve_connection(conn, encoder):
+    try:
+        while True:
+            request = recv_message(conn)
+            try:
+                send_message(conn, {"embeddings": encoder.encode(request["texts"], request.get("model"))})
+            except Exception as e:
+                send_message(conn, {"error": str(e)})
+    except EOFError:
+        pass
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Dropping embedding client after malformed request: {e}")
+    finally:
+        conn.close()
+
+def active_model():
+    """The model retrieval currently uses, so the worker warms the one that will be asked for."""
+    try:
+        from pymongo import MongoClient
+        from utils.embedding_versions import get_active_model
+        client = MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
+        try:
+            return get_active_model(client.get_default_database())
+        finally:
+            client.close()
+    except Exception as e:
+        logger.warning(f"Could not read the active embedding model ({e}); warming {config.EMBEDDING_MODEL}")
+        return config.EMBEDDING_MODEL
+
+def main():
+    if not config.EMBEDDING_SERVICE_ADDRESS:
+        raise SystemExit("EMBEDDING_SERVICE_ADDRESS must be set for the embedding worker")
+    address = parse_address(config.EMBEDDING_SERVICE_ADDRESS)
+    try:
+        authkey = service_authkey(address, config.EMBEDDING_SERVICE_AUTHKEY)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)
+
+    # The worker always encodes locally, whatever the API tier is configured with
+    config.EMBEDDING_SERVICE_ADDRESS = ""
+    warm_up(model_name=active_model())
+    encoder = BatchingEncoder()
+
+    with Listener(address, authkey=authkey) as listener:
+        if isinstance(address, str):
+            # Without a key the socket's permissions are the only access check
+            os.chmod(address, 0o600)
+        logger.info(f"Embedding worker listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected embedding client: {e}")
+                continue
+            threading.Thread(target=serve_connection, args=(conn, encoder), daemon=True).start()
+
+if __name__ == '__main__':
+    main()
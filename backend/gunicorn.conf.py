@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = 120
+
+# In-process status events only reach streams in the same worker
+if workers > 1:
+    os.environ.setdefault("DOCUMENT_EVENTS_BACKEND", "changestream")
+
+# Load the embedding model once in the master and share it copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+if preload_app:
+    os.environ.setdefault("EMBEDDING_WARMUP", "load")
+    # Threads started in the master would not survive the fork
+    os.environ.setdefault("BACKGROUND_TASKS_START", "post_fork")
+
+def when_ready(server):
+    # The master used MongoDB while loading the app; workers open their own clients
+    if preload_app:
+        from utils.mongo import close_all
+        close_all()
+
+def post_fork(server, worker):
+    from config import config
+    if preload_app and config.EMBEDDING_WARMUP != "off":
+        from utils.embeddings import warm_up
+        warm_up()
+    if config.BACKGROUND_TASKS_START == "post_fork":
+        from app import start_background_tasks
+        start_background_tasks(server.app.wsgi())
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the multiprocess metrics directory
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
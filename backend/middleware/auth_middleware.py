@@ -1,8 +1,8 @@
 # middleware/auth_middleware.py
 from functools import wraps
 from flask import jsonify, current_app
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from bson import ObjectId
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from utils.user_cache import get_user_access
 
 def require_auth(f):
     @wraps(f)
@@ -19,10 +19,13 @@ def require_admin(f):
     def decorated(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            db = current_app.db
-            user = db.users.find_one({"_id": ObjectId(user_id)})
-            if not user or user.get("role") != "admin":
+            # The role claim is signed; tokens issued before it existed carry none
+            claimed_role = get_jwt().get("role")
+            if claimed_role is not None and claimed_role != "admin":
+                return jsonify({"error": "Admin access required"}), 403
+            # Revocations and demotions since the token was issued
+            access = get_user_access(current_app.db, get_jwt_identity())
+            if not access or not access["is_active"] or access["role"] != "admin":
                 return jsonify({"error": "Admin access required"}), 403
         except Exception as e:
             return jsonify({"error": "Authentication failed"}), 401
@@ -21,16 +21,28 @@ def create_message(session_id, user_id, role, content, sources=None, tokens_used
         "created_at": datetime.now(timezone.utc)
     }
 
+# Message fields without `sources`; source_count is computed server-side
+MESSAGE_SUMMARY_PROJECTION = {
+    "session_id": 1, "role": 1, "content": 1, "tokens_used": 1, "created_at": 1,
+    "source_count": {"$size": {"$ifNull": ["$sources", []]}}
+}
+
 def message_to_dict(msg):
-    return {
+    data = {
         "id": str(msg["_id"]),
         "session_id": str(msg["session_id"]),
         "role": msg["role"],
         "content": msg["content"],
-        "sources": msg.get("sources", []),
         "tokens_used": msg.get("tokens_used", 0),
         "created_at": msg["created_at"].isoformat() if msg.get("created_at") else None
     }
+    if "source_count" in msg:
+        # Loaded with MESSAGE_SUMMARY_PROJECTION: sources are fetched lazily
+        data["source_count"] = msg["source_count"]
+    else:
+        data["sources"] = msg.get("sources", [])
+        data["source_count"] = len(data["sources"])
+    return data
 
 def session_to_dict(session):
     return {
@@ -1,4 +1,5 @@
 # models/document.py
+import hashlib
 from datetime import datetime, timezone
 
 def create_document(user_id, filename, original_name, file_type, file_size):
@@ -25,19 +26,34 @@ def document_to_dict(doc):
         "file_type": doc["file_type"],
         "file_size": doc["file_size"],
         "status": doc.get("status", "processing"),
+        "stage": doc.get("stage"),
+        "progress": doc.get("progress"),
         "chunk_count": doc.get("chunk_count", 0),
         "is_active": doc.get("is_active", True),
         "created_at": doc["created_at"].isoformat() if doc.get("created_at") else None,
-        "error_message": doc.get("error_message")
+        "error_message": doc.get("error_message"),
+        "last_replace": doc.get("last_replace")
     }
 
-def create_chunk(document_id, user_id, content, chunk_index, embedding=None):
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def create_chunk(document_id, user_id, content, chunk_index, embedding=None, is_active=False,
+                 embedding_model=None, revision=None):
+    # user_id and is_active mirror the parent document so retrieval is one indexed query;
+    # chunks start inactive and are switched on once the whole document is ready;
+    # content_hash lets a replacement revision reuse unchanged chunks' embeddings
     return {
         "document_id": document_id,
-        "user_id": user_id,
+        "user_id": str(user_id),
+        "is_active": is_active,
         "content": content,
+        "content_hash": content_hash(content),
         "chunk_index": chunk_index,
+        "revision": revision,
         "embedding": embedding,
+        "embedding_model": embedding_model if embedding is not None else None,
+        "embedding_dim": len(embedding) if embedding is not None else 0,
         "token_count": len(content.split()),
         "created_at": datetime.now(timezone.utc)
     }
\ No newline at end of file
@@ -0,0 +1,93 @@
+# models/schema.py
+import logging
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+# Index set per collection, derived from the query shapes below.
+# Each entry is (keys, options).
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("username", ASCENDING)], {"unique": True}),
+        # /admin/users keyset pagination
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "documents": [
+        # /documents/list
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # /admin/documents, with and without ?status=
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "document_chunks": [
+        ([("document_id", ASCENDING)], {}),
+        # Retrieval candidates: a user's active chunks
+        ([("user_id", ASCENDING), ("is_active", ASCENDING)], {}),
+    ],
+    "chat_sessions": [
+        # /chat/sessions, and ownership checks by user
+        ([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "messages": [
+        # Session history (walked backwards for newest-first) and transcript loads
+        ([("session_id", ASCENDING), ("user_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], {}),
+        # /chat/history
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        # /admin/queries
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # Recent user queries for stats reconciliation
+        ([("role", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+}
+
+_SAMPLE_ID = "000000000000000000000000"
+
+# Representative query shapes issued by the routes, used by the index advisor.
+QUERY_SHAPES = [
+    {"name": "chat.ask history", "collection": "messages",
+     "filter": {"session_id": _SAMPLE_ID, "user_id": _SAMPLE_ID},
+     "projection": {"_id": 0, "role": 1, "content": 1},
+     "sort": [("created_at", DESCENDING)], "limit": 10},
+    {"name": "chat.get_session messages", "collection": "messages",
+     "filter": {"session_id": _SAMPLE_ID, "user_id": _SAMPLE_ID},
+     "projection": {"role": 1, "content": 1, "source_count": {"$size": {"$ifNull": ["$sources", []]}}},
+     "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 51},
+    {"name": "chat.export_session", "collection": "messages",
+     "filter": {"session_id": _SAMPLE_ID, "user_id": _SAMPLE_ID},
+     "sort": [("created_at", ASCENDING), ("_id", ASCENDING)]},
+    {"name": "chat.history", "collection": "messages",
+     "filter": {"user_id": _SAMPLE_ID},
+     "sort": [("created_at", DESCENDING)], "limit": 50},
+    {"name": "chat.list_sessions", "collection": "chat_sessions",
+     "filter": {"user_id": _SAMPLE_ID},
+     "sort": [("updated_at", DESCENDING), ("_id", DESCENDING)], "limit": 21},
+    {"name": "documents.list", "collection": "documents",
+     "filter": {"user_id": _SAMPLE_ID},
+     "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 21},
+    {"name": "rag.candidate_chunks", "collection": "document_chunks",
+     "filter": {"user_id": _SAMPLE_ID, "is_active": True, "$or": [
+         {"embedding_model": {"$in": ["all-MiniLM-L6-v2", None]}},
+         {"embedding_shadow_model": "all-MiniLM-L6-v2"}
+     ]},
+     "projection": {"document_id": 1, "content": 1, "chunk_index": 1, "embedding": 1}},
+    {"name": "documents.delete chunks", "collection": "document_chunks",
+     "filter": {"document_id": _SAMPLE_ID}},
+    {"name": "admin.list_users", "collection": "users",
+     "filter": {}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 21},
+    {"name": "admin.list_documents", "collection": "documents",
+     "filter": {}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 21},
+    {"name": "admin.list_documents by status", "collection": "documents",
+     "filter": {"status": "ready"},
+     "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 21},
+    {"name": "admin.list_queries", "collection": "messages",
+     "filter": {}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)], "limit": 31},
+    {"name": "stats.recent_queries", "collection": "messages",
+     "filter": {"role": "user"}, "sort": [("created_at", DESCENDING)], "limit": 10},
+]
+
+def ensure_indexes(db):
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            db[collection].create_index(keys, **options)
+    logger.info("MongoDB indexes created successfully")
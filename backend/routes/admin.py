@@ -4,10 +4,20 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from datetime import datetime, timezone
 import logging
+import os
 
 from middleware.auth_middleware import require_admin
 from models.user import user_to_dict
 from models.document import document_to_dict
+from utils.rag import coalescing_stats
+from utils.user_cache import resolve_users, invalidate_user
+from utils.pagination import paginate
+from utils.embedding_versions import get_state, start_reembed, cancel_reembed
+from utils import rechunk
+from utils import profiler
+from utils.stats import (
+    DOC_STATUSES, stats_op, status_change, get_stats_doc, reconcile_stats
+)
 
 admin_bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -16,84 +26,68 @@ logger = logging.getLogger(__name__)
 @require_admin
 def get_stats():
     db = current_app.db
-    
-    total_users = db.users.count_documents({})
-    total_docs = db.documents.count_documents({})
-    total_chunks = db.document_chunks.count_documents({})
-    total_sessions = db.chat_sessions.count_documents({})
-    total_messages = db.messages.count_documents({})
-    
-    # Token usage aggregate
-    pipeline = [
-        {"$group": {
-            "_id": None,
-            "total_tokens": {"$sum": "$total_tokens_used"},
-            "total_queries": {"$sum": "$total_queries"}
-        }}
-    ]
-    usage = list(db.users.aggregate(pipeline))
-    token_data = usage[0] if usage else {"total_tokens": 0, "total_queries": 0}
-    
-    # Docs by status
-    docs_by_status = {}
-    for status in ["ready", "processing", "error", "disabled"]:
-        docs_by_status[status] = db.documents.count_documents({"status": status})
-    
-    # Recent activity
-    recent_messages = list(db.messages.find(
-        {"role": "user"},
-        sort=[("created_at", -1)]
-    ).limit(10))
-    
+
+    # Served from the materialized stats document maintained at write sites
+    stats = get_stats_doc(db)
+    users = stats.get("users", {})
+    documents = stats.get("documents", {})
+    conversations = stats.get("conversations", {})
+    usage = stats.get("usage", {})
+    total_tokens = usage.get("total_tokens", 0)
+
     return jsonify({
         "users": {
-            "total": total_users,
-            "active": db.users.count_documents({"is_active": True})
+            "total": users.get("total", 0),
+            "active": users.get("active", 0)
         },
         "documents": {
-            "total": total_docs,
-            "by_status": docs_by_status,
-            "total_chunks": total_chunks
+            "total": documents.get("total", 0),
+            "by_status": {
+                status: documents.get("by_status", {}).get(status, 0)
+                for status in DOC_STATUSES
+            },
+            "total_chunks": documents.get("total_chunks", 0)
         },
         "conversations": {
-            "total_sessions": total_sessions,
-            "total_messages": total_messages
+            "total_sessions": conversations.get("total_sessions", 0),
+            "total_messages": conversations.get("total_messages", 0)
         },
         "usage": {
-            "total_tokens": token_data.get("total_tokens", 0),
-            "total_queries": token_data.get("total_queries", 0),
-            "estimated_cost_usd": round(token_data.get("total_tokens", 0) * 0.000002, 4)
+            "total_tokens": total_tokens,
+            "total_queries": usage.get("total_queries", 0),
+            "estimated_cost_usd": round(total_tokens * 0.000002, 4)
         },
+        "coalescing": coalescing_stats(),
         "recent_queries": [
             {
-                "content": m["content"][:100],
-                "user_id": m["user_id"],
-                "created_at": m["created_at"].isoformat()
+                "content": q["content"],
+                "user_id": q["user_id"],
+                "created_at": q["created_at"].isoformat()
             }
-            for m in recent_messages
-        ]
+            for q in reversed(stats.get("recent_queries", []))
+        ],
+        "reconciled_at": stats["reconciled_at"].isoformat() if stats.get("reconciled_at") else None
     })
 
+@admin_bp.route('/stats/reconcile', methods=['POST'])
+@require_admin
+def reconcile():
+    reconcile_stats(current_app.db)
+    return jsonify({"message": "Stats reconciled successfully"})
+
 @admin_bp.route('/users', methods=['GET'])
 @require_admin
 def list_users():
     db = current_app.db
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
-    users = list(db.users.find(
-        {},
-        sort=[("created_at", -1)]
-    ).skip(skip).limit(limit))
-    
-    total = db.users.count_documents({})
+    try:
+        users, meta = paginate(db.users, {}, "created_at", request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     return jsonify({
         "users": [user_to_dict(u) for u in users],
-        "total": total,
-        "page": page
+        **meta
     })
 
 @admin_bp.route('/users/<user_id>/toggle', methods=['PUT'])
@@ -118,6 +112,8 @@ def toggle_user(user_id):
         {"_id": ObjectId(user_id)},
         {"$set": {"is_active": new_status}}
     )
+    current_app.write_behind.submit([stats_op({"users.active": 1 if new_status else -1})])
+    invalidate_user(user_id)
     
     return jsonify({
         "message": f"User {'enabled' if new_status else 'disabled'} successfully",
@@ -129,35 +125,30 @@ def toggle_user(user_id):
 def list_all_documents():
     db = current_app.db
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
     status_filter = request.args.get('status')
     
     query = {}
     if status_filter:
         query["status"] = status_filter
     
-    docs = list(db.documents.find(
-        query,
-        sort=[("created_at", -1)]
-    ).skip(skip).limit(limit))
-    
-    total = db.documents.count_documents(query)
+    try:
+        docs, meta = paginate(db.documents, query, "created_at", request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    # Enrich with usernames
+    # Enrich with usernames (one batched lookup per page)
+    users = resolve_users(db, [doc.get("user_id") for doc in docs])
     result = []
     for doc in docs:
         d = document_to_dict(doc)
-        user = db.users.find_one({"_id": ObjectId(doc["user_id"])}, {"username": 1, "email": 1})
-        d["uploaded_by"] = user.get("username", "Unknown") if user else "Unknown"
-        d["user_email"] = user.get("email", "") if user else ""
+        user = users.get(str(doc.get("user_id")))
+        d["uploaded_by"] = user["username"] if user else "Unknown"
+        d["user_email"] = user["email"] if user else ""
         result.append(d)
     
     return jsonify({
         "documents": result,
-        "total": total,
-        "page": page
+        **meta
     })
 
 @admin_bp.route('/documents/<document_id>/toggle', methods=['PUT'])
@@ -184,6 +175,13 @@ def toggle_document(document_id):
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    db.document_chunks.update_many(
+        {"document_id": document_id},
+        {"$set": {"is_active": new_active}}
+    )
+    increments = status_change(doc.get("status"), new_status)
+    if increments:
+        current_app.write_behind.submit([stats_op(increments)])
     
     return jsonify({
         "message": f"Document {'enabled' if new_active else 'disabled'} successfully",
@@ -195,17 +193,12 @@ def toggle_document(document_id):
 def list_queries():
     db = current_app.db
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 30))
-    skip = (page - 1) * limit
-    
-    messages = list(db.messages.find(
-        {},
-        sort=[("created_at", -1)]
-    ).skip(skip).limit(limit))
-    
-    total = db.messages.count_documents({})
+    try:
+        messages, meta = paginate(db.messages, {}, "created_at", request.args, default_limit=30)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
+    users = resolve_users(db, [msg.get("user_id") for msg in messages])
     result = []
     for msg in messages:
         m = {
@@ -217,12 +210,190 @@ def list_queries():
             "user_id": msg.get("user_id"),
             "created_at": msg["created_at"].isoformat() if msg.get("created_at") else None
         }
-        user = db.users.find_one({"_id": ObjectId(msg["user_id"])}, {"username": 1}) if msg.get("user_id") else None
-        m["username"] = user.get("username", "Unknown") if user else "Unknown"
+        user = users.get(str(msg.get("user_id")))
+        m["username"] = user["username"] if user else "Unknown"
         result.append(m)
     
     return jsonify({
         "messages": result,
-        "total": total,
-        "page": page
-    })
\ No newline at end of file
+        **meta
+    })
+
+@admin_bp.route('/embeddings', methods=['GET'])
+@require_admin
+def embedding_status():
+    return jsonify(get_state(current_app.db))
+
+def _job_option(data, name, minimum, maximum):
+    """Optional integer job setting from a JSON body; None means the config default.
+
+    Checked before the job slot is claimed, so a bad value cannot leave a
+    claimed job with no thread behind it. Raises ValueError.
+    """
+    value = data.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+        raise ValueError(f"{name} must be an integer from {minimum} to {maximum}")
+    return value
+
+@admin_bp.route('/embeddings/reembed', methods=['POST'])
+@require_admin
+def reembed():
+    data = request.get_json(silent=True) or {}
+    model = data.get('model')
+    if not isinstance(model, str) or not model.strip():
+        return jsonify({"error": "Target model is required"}), 400
+    model = model.strip()
+    try:
+        batch_size = _job_option(data, 'batch_size', 1, 4096)
+        pause_ms = _job_option(data, 'pause_ms', 0, 60000)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    state = get_state(current_app.db)
+    # Re-running for the active model finishes a sweep that was cancelled after cutover
+    resume_sweep = state["job"]["status"] == "cancelled" and state["job"]["phase"] == "sweep"
+    if model == state["active_model"] and not resume_sweep:
+        return jsonify({"error": f"{model} is already the active model"}), 400
+    
+    app = current_app._get_current_object()
+    started = start_reembed(app, model, batch_size, pause_ms)
+    if not started:
+        return jsonify({"error": "A re-embedding job is already running"}), 409
+    
+    return jsonify({"message": f"Re-embedding with {model} started"}), 202
+
+@admin_bp.route('/embeddings/cancel', methods=['POST'])
+@require_admin
+def cancel_reembed_job():
+    if not cancel_reembed(current_app.db):
+        return jsonify({"error": "No re-embedding job is running"}), 404
+    return jsonify({"message": "Re-embedding cancellation requested"})
+
+@admin_bp.route('/documents/rechunk', methods=['GET'])
+@require_admin
+def rechunk_status():
+    return jsonify(rechunk.get_state(current_app.db))
+
+@admin_bp.route('/documents/rechunk', methods=['POST'])
+@require_admin
+def rechunk_documents():
+    """Rebuild chunks and embeddings of `document_ids` from their stored text."""
+    data = request.get_json() or {}
+    document_ids = data.get('document_ids') or []
+    if not isinstance(document_ids, list) or not document_ids:
+        return jsonify({"error": "document_ids is required"}), 400
+    invalid = [d for d in document_ids if not isinstance(d, str) or not ObjectId.is_valid(d)]
+    if invalid:
+        return jsonify({"error": f"Invalid document IDs: {', '.join(map(str, invalid[:5]))}"}), 400
+    
+    try:
+        workers = _job_option(data, 'workers', 1, rechunk.MAX_WORKERS)
+        pause_ms = _job_option(data, 'pause_ms', 0, 60000)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    app = current_app._get_current_object()
+    document_ids = list(dict.fromkeys(document_ids))
+    if not rechunk.start_rechunk(app, document_ids, workers, pause_ms):
+        return jsonify({"error": "A rechunk job is already running"}), 409
+    
+    return jsonify({"message": f"Rechunking {len(document_ids)} documents started"}), 202
+
+@admin_bp.route('/documents/rechunk/cancel', methods=['POST'])
+@require_admin
+def cancel_rechunk_job():
+    if not rechunk.cancel_rechunk(current_app.db):
+        return jsonify({"error": "No rechunk job is running"}), 404
+    return jsonify({"message": "Rechunk cancellation requested"})
+
+# Profiling applies to the worker that serves the request; responses carry its pid.
+# Pass ?pid=<pid> to reads to refuse answers from a different worker (409, retry).
+
+def _wrong_worker():
+    pid = request.args.get('pid')
+    if pid and pid != str(os.getpid()):
+        return jsonify({"error": "Served by a different worker", "pid": os.getpid()}), 409
+    return None
+
+def _report_limit():
+    """?limit= for profiler reports, 1..200 (default 20). Raises ValueError."""
+    return max(1, min(int(request.args.get('limit', 20)), 200))
+
+@admin_bp.route('/profile/cpu', methods=['POST'])
+@require_admin
+def start_cpu_profile():
+    data = request.get_json(silent=True) or {}
+    try:
+        started = profiler.cpu_profiler.start(
+            seconds=data.get('seconds'),
+            requests=data.get('requests'),
+            interval_ms=data.get('interval_ms', 10)
+        )
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds, requests and interval_ms must be numbers"}), 400
+    if not started:
+        return jsonify({"error": "CPU profiler already running", **profiler.cpu_profiler.status()}), 409
+    return jsonify({"message": "CPU profiler started", **profiler.cpu_profiler.status()}), 202
+
+@admin_bp.route('/profile/cpu', methods=['GET'])
+@require_admin
+def get_cpu_profile():
+    wrong = _wrong_worker()
+    if wrong:
+        return wrong
+    if request.args.get('format') == 'collapsed':
+        # Feed to flamegraph.pl or drop into speedscope.app
+        return profiler.cpu_profiler.collapsed(), 200, {
+            "Content-Type": "text/plain; charset=utf-8",
+            "Content-Disposition": f"attachment; filename=cpu-{os.getpid()}.folded"
+        }
+    try:
+        limit = _report_limit()
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({**profiler.cpu_profiler.status(), "top": profiler.cpu_profiler.top(limit)})
+
+@admin_bp.route('/profile/cpu/stop', methods=['POST'])
+@require_admin
+def stop_cpu_profile():
+    profiler.cpu_profiler.stop()
+    return jsonify(profiler.cpu_profiler.status())
+
+@admin_bp.route('/profile/memory', methods=['POST'])
+@require_admin
+def start_memory_profile():
+    data = request.get_json(silent=True) or {}
+    frames = data.get('frames', 10)
+    if isinstance(frames, bool) or not isinstance(frames, int):
+        return jsonify({"error": "frames must be an integer"}), 400
+    frames = max(1, min(frames, profiler.MAX_MEMORY_FRAMES))
+    if not profiler.start_memory(frames):
+        return jsonify({"error": "tracemalloc is already tracing", "pid": os.getpid()}), 409
+    return jsonify({"message": "Memory tracing started", "pid": os.getpid()}), 202
+
+@admin_bp.route('/profile/memory', methods=['GET'])
+@require_admin
+def get_memory_profile():
+    wrong = _wrong_worker()
+    if wrong:
+        return wrong
+    key_type = request.args.get('group_by', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+    try:
+        limit = _report_limit()
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    report = profiler.memory_report(limit, key_type)
+    if report is None:
+        return jsonify({"error": "Memory tracing is not running", "pid": os.getpid()}), 404
+    return jsonify(report)
+
+@admin_bp.route('/profile/memory/stop', methods=['POST'])
+@require_admin
+def stop_memory_profile():
+    if not profiler.stop_memory():
+        return jsonify({"error": "Memory tracing is not running", "pid": os.getpid()}), 404
+    return jsonify({"message": "Memory tracing stopped", "pid": os.getpid()})
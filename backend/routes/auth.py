@@ -1,10 +1,16 @@
 # routes/auth.py
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-import bcrypt
 from datetime import timedelta
+from pymongo import UpdateOne
 from models.user import create_user, user_to_dict
+from utils.stats import stats_op
+from utils.passwords import (
+    PasswordServiceBusy, hash_password, verify_password, needs_rehash,
+    rehash_in_background, email_limiter, ip_limiter
+)
 from bson import ObjectId
+from config import config
 import logging
 import re
 
@@ -14,6 +20,23 @@ logger = logging.getLogger(__name__)
 def validate_email(email):
     return re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email)
 
+def too_many_attempts(retry_after):
+    response = jsonify({"error": "Too many attempts, try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+def client_ip():
+    """Address for the per-IP limiter, or None when it is off (LOGIN_IP_LIMIT_ENABLED)."""
+    if not config.LOGIN_IP_LIMIT_ENABLED:
+        return None
+    # The real client once ProxyFix has applied TRUSTED_PROXY_COUNT
+    return request.remote_addr or "unknown"
+
+def hashing_busy():
+    response = jsonify({"error": "Server busy, try again shortly"})
+    response.headers["Retry-After"] = "2"
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -37,6 +60,14 @@ def register():
     if len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
     
+    ip = client_ip()
+    if ip:
+        retry_after = ip_limiter.retry_after(ip)
+        if retry_after:
+            return too_many_attempts(retry_after)
+        # Every registration costs a hash, so they all count against the IP
+        ip_limiter.record(ip)
+    
     db = current_app.db
     
     if db.users.find_one({"email": email}):
@@ -45,16 +76,21 @@ def register():
     if db.users.find_one({"username": username}):
         return jsonify({"error": "Username already taken"}), 409
     
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    try:
+        hashed = hash_password(password)
+    except PasswordServiceBusy:
+        return hashing_busy()
     
     role = "admin" if db.users.count_documents({}) == 0 else "user"
     
-    user_doc = create_user(username, email, hashed.decode('utf-8'), role)
+    user_doc = create_user(username, email, hashed, role)
     result = db.users.insert_one(user_doc)
+    current_app.write_behind.submit([stats_op({"users.total": 1, "users.active": 1})])
     
     user_doc['_id'] = result.inserted_id
     token = create_access_token(
         identity=str(result.inserted_id),
+        additional_claims={"role": role},
         expires_delta=timedelta(days=7)
     )
     
@@ -79,20 +115,44 @@ def login():
     if not email or not password:
         return jsonify({"error": "Email and password are required"}), 400
     
+    ip = client_ip()
+    retry_after = max(email_limiter.retry_after(email), ip_limiter.retry_after(ip) if ip else 0)
+    if retry_after:
+        return too_many_attempts(retry_after)
+    
     db = current_app.db
     user = db.users.find_one({"email": email})
     
     if not user:
+        if ip:
+            ip_limiter.record(ip)
         return jsonify({"error": "Invalid email or password"}), 401
     
     if not user.get('is_active', True):
         return jsonify({"error": "Account is disabled"}), 403
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    try:
+        valid = verify_password(password, user['password'])
+    except PasswordServiceBusy:
+        return hashing_busy()
+    if not valid:
+        email_limiter.record(email)
+        if ip:
+            ip_limiter.record(ip)
         return jsonify({"error": "Invalid email or password"}), 401
+    email_limiter.reset(email)
+    
+    if needs_rehash(user['password']):
+        # Cost changed since this hash was made; upgrade it off the response path
+        write_behind = current_app.write_behind
+        rehash_in_background(password, lambda new_hash: write_behind.submit([("users", UpdateOne(
+            {"_id": user['_id'], "password": user['password']},
+            {"$set": {"password": new_hash}}
+        ))]))
     
     token = create_access_token(
         identity=str(user['_id']),
+        additional_claims={"role": user.get("role", "user")},
         expires_delta=timedelta(days=7)
     )
     
@@ -134,13 +194,16 @@ def change_password():
     db = current_app.db
     user = db.users.find_one({"_id": ObjectId(user_id)})
     
-    if not bcrypt.checkpw(old_password.encode('utf-8'), user['password'].encode('utf-8')):
-        return jsonify({"error": "Current password is incorrect"}), 401
+    try:
+        if not verify_password(old_password, user['password']):
+            return jsonify({"error": "Current password is incorrect"}), 401
+        hashed = hash_password(new_password)
+    except PasswordServiceBusy:
+        return hashing_busy()
     
-    hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
     db.users.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"password": hashed.decode('utf-8')}}
+        {"$set": {"password": hashed}}
     )
     
     return jsonify({"message": "Password updated successfully"})
\ No newline at end of file
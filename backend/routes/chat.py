@@ -217,13 +217,21 @@
 
 
 # routes/chat.py
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from datetime import datetime, timezone
+from pymongo import InsertOne, UpdateOne
+import json
 import logging
-from models.chat import create_session, create_message, message_to_dict, session_to_dict
+from models.chat import (
+    create_session, create_message, message_to_dict, session_to_dict, MESSAGE_SUMMARY_PROJECTION
+)
 from utils.rag import retrieve_relevant_chunks, generate_answer, generate_session_title
+from utils.stats import stats_op
+from utils.pagination import paginate
+from utils.metrics import timed
+from utils import context_cache
 
 chat_bp = Blueprint('chat', __name__)
 logger = logging.getLogger(__name__)
@@ -243,52 +251,52 @@ def ask():
         return jsonify({"error": "Question too long (max 2000 characters)"}), 400
 
     db = current_app.db
+    new_session = not session_id
 
     # Get or create session — strictly tied to user_id
-    if session_id:
-        try:
-            session = db.chat_sessions.find_one({
-                "_id": ObjectId(session_id),
-                "user_id": user_id  # ← must belong to THIS user
-            })
-        except:
-            session = None
-        if not session:
-            return jsonify({"error": "Session not found"}), 404
-    else:
-        title = generate_session_title(question)
-        session_doc = create_session(user_id, title)
-        result = db.chat_sessions.insert_one(session_doc)
-        session_id = str(result.inserted_id)
-        session_doc['_id'] = result.inserted_id
-        session = session_doc
-
-    # Get only THIS session's history
-    history_msgs = list(db.messages.find(
-        {
-            "session_id": str(session["_id"]),
-            "user_id": user_id  # ← only this user's messages
-        },
-        sort=[("created_at", 1)]
-    ).limit(10))
-    history = [{"role": m["role"], "content": m["content"]} for m in history_msgs]
-
-    # Save user message
+    with timed("session_lookup"):
+        if session_id:
+            try:
+                session = db.chat_sessions.find_one({
+                    "_id": ObjectId(session_id),
+                    "user_id": user_id  # ← must belong to THIS user
+                })
+            except:
+                session = None
+        else:
+            title = generate_session_title(question)
+            session_doc = create_session(user_id, title)
+            result = db.chat_sessions.insert_one(session_doc)
+            session_id = str(result.inserted_id)
+            session_doc['_id'] = result.inserted_id
+            session = session_doc
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    # Recent turns of THIS session (this user's messages only)
+    with timed("history_fetch"):
+        if new_session:
+            context_cache.start_session(session_id)
+            history, history_count = [], 0
+        else:
+            history, history_count = context_cache.load_history(db, session, user_id)
+
     user_msg = create_message(
         session_id=str(session["_id"]),
         user_id=user_id,
         role="user",
         content=question
     )
-    user_msg_result = db.messages.insert_one(user_msg)
-    user_msg['_id'] = user_msg_result.inserted_id
+    user_msg['_id'] = ObjectId()
 
     # RAG — only search THIS user's documents
     try:
-        context_chunks = retrieve_relevant_chunks(
-            db, question, user_id=user_id
-        )
-        result = generate_answer(question, context_chunks, history)
+        with timed("retrieve"):
+            context_chunks = retrieve_relevant_chunks(
+                db, question, user_id=user_id
+            )
+        with timed("generate"):
+            result = generate_answer(question, context_chunks, history)
         answer = result["answer"]
         sources = result["sources"]
         tokens_used = result["tokens_used"]
@@ -298,7 +306,6 @@ def ask():
         sources = []
         tokens_used = 0
 
-    # Save assistant message
     assistant_msg = create_message(
         session_id=str(session["_id"]),
         user_id=user_id,
@@ -307,23 +314,39 @@ def ask():
         sources=sources,
         tokens_used=tokens_used
     )
-    assistant_msg_result = db.messages.insert_one(assistant_msg)
-    assistant_msg['_id'] = assistant_msg_result.inserted_id
-
-    # Update session stats
-    db.chat_sessions.update_one(
-        {"_id": session["_id"]},
-        {
-            "$set": {"updated_at": datetime.now(timezone.utc)},
-            "$inc": {"message_count": 2}
-        }
-    )
-
-    # Update user token usage
-    db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$inc": {"total_queries": 1, "total_tokens_used": tokens_used}}
-    )
+    assistant_msg['_id'] = ObjectId()
+    context_cache.append_turns(session["_id"], [user_msg, assistant_msg], history_count)
+
+    # Persist messages, session stats and user token usage off the response path
+    with timed("writes"):
+        current_app.write_behind.submit([
+            ("messages", InsertOne(user_msg)),
+            ("messages", InsertOne(assistant_msg)),
+            ("chat_sessions", UpdateOne(
+                {"_id": session["_id"]},
+                {
+                    "$set": {"updated_at": datetime.now(timezone.utc)},
+                    "$inc": {"message_count": 2}
+                }
+            )),
+            ("users", UpdateOne(
+                {"_id": ObjectId(user_id)},
+                {"$inc": {"total_queries": 1, "total_tokens_used": tokens_used}}
+            )),
+            stats_op(
+                {
+                    "conversations.total_sessions": 1 if new_session else 0,
+                    "conversations.total_messages": 2,
+                    "usage.total_queries": 1,
+                    "usage.total_tokens": tokens_used
+                },
+                recent_query={
+                    "content": question[:100],
+                    "user_id": user_id,
+                    "created_at": user_msg["created_at"]
+                }
+            )
+        ])
 
     return jsonify({
         "session_id": str(session["_id"]),
@@ -339,22 +362,20 @@ def ask():
 def list_sessions():
     user_id = get_jwt_identity()
     db = current_app.db
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-
     # ONLY return sessions belonging to this user
-    sessions = list(db.chat_sessions.find(
-        {"user_id": user_id},  # ← strict filter
-        sort=[("updated_at", -1)]
-    ).skip(skip).limit(limit))
-
-    total = db.chat_sessions.count_documents({"user_id": user_id})
+    try:
+        sessions, meta = paginate(
+            db.chat_sessions,
+            {"user_id": user_id},  # ← strict filter
+            "updated_at",
+            request.args
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     return jsonify({
         "sessions": [session_to_dict(s) for s in sessions],
-        "total": total,
-        "page": page
+        **meta
     })
 
 @chat_bp.route('/sessions/<session_id>', methods=['GET'])
@@ -375,18 +396,73 @@ def get_session(session_id):
     if not session:
         return jsonify({"error": "Session not found"}), 404
 
-    # Only get messages for this session AND this user
-    messages = list(db.messages.find(
-        {
-            "session_id": session_id,
-            "user_id": user_id  # ← strict filter
-        },
-        sort=[("created_at", 1)]
-    ))
+    # Newest window of this session's messages; `next_cursor` pages to older ones
+    include_sources = request.args.get('include_sources') in ('1', 'true')
+    try:
+        messages, meta = paginate(
+            db.messages,
+            {"session_id": session_id, "user_id": user_id},  # ← strict filter
+            "created_at",
+            request.args,
+            default_limit=50,
+            projection=None if include_sources else MESSAGE_SUMMARY_PROJECTION
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     return jsonify({
         "session": session_to_dict(session),
-        "messages": [message_to_dict(m) for m in messages]
+        "messages": [message_to_dict(m) for m in reversed(messages)],  # chronological
+        **meta
+    })
+
+@chat_bp.route('/messages/<message_id>/sources', methods=['GET'])
+@jwt_required()
+def get_message_sources(message_id):
+    user_id = get_jwt_identity()
+    try:
+        msg = current_app.db.messages.find_one(
+            {"_id": ObjectId(message_id), "user_id": user_id},  # ← strict filter
+            {"sources": 1}
+        )
+    except Exception:
+        return jsonify({"error": "Invalid message ID"}), 400
+
+    if not msg:
+        return jsonify({"error": "Message not found"}), 404
+
+    return jsonify({"message_id": message_id, "sources": msg.get("sources", [])})
+
+@chat_bp.route('/sessions/<session_id>/export', methods=['GET'])
+@jwt_required()
+def export_session(session_id):
+    """Full transcript as NDJSON: a session line, then one line per message."""
+    user_id = get_jwt_identity()
+    db = current_app.db
+
+    try:
+        session = db.chat_sessions.find_one({
+            "_id": ObjectId(session_id),
+            "user_id": user_id  # ← strict filter
+        })
+    except:
+        return jsonify({"error": "Invalid session ID"}), 400
+
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+
+    def generate():
+        yield json.dumps({"type": "session", **session_to_dict(session)}) + "\n"
+        cursor = db.messages.find(
+            {"session_id": session_id, "user_id": user_id},
+            sort=[("created_at", 1), ("_id", 1)],
+            batch_size=200
+        )
+        for m in cursor:
+            yield json.dumps({"type": "message", **message_to_dict(m)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers={
+        "Content-Disposition": f"attachment; filename=session-{session_id}.ndjson"
     })
 
 @chat_bp.route('/sessions/<session_id>', methods=['DELETE'])
@@ -406,8 +482,13 @@ def delete_session(session_id):
     if not session:
         return jsonify({"error": "Session not found"}), 404
 
-    db.messages.delete_many({"session_id": session_id, "user_id": user_id})
+    deleted = db.messages.delete_many({"session_id": session_id, "user_id": user_id})
     db.chat_sessions.delete_one({"_id": ObjectId(session_id)})
+    context_cache.invalidate(session_id)
+    current_app.write_behind.submit([stats_op({
+        "conversations.total_sessions": -1,
+        "conversations.total_messages": -deleted.deleted_count
+    })])
 
     return jsonify({"message": "Session deleted successfully"})
 
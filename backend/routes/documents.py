@@ -1,16 +1,24 @@
 # routes/documents.py
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
-from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from datetime import datetime, timezone, timedelta
 import os
+import json
+import queue
+import time
 import uuid
+import zipfile
 import threading
 import logging
 
-from models.document import create_document, document_to_dict, create_chunk
-from utils.chunker import extract_text, chunk_text
-from utils.embeddings import generate_embeddings_batch
+from models.document import create_document, document_to_dict
+from utils.ingestion import ingest, ingestion_item, replace, replacement_item
+from utils.stats import stats_op, status_change
+from utils.pagination import paginate
+from utils.metrics import timed
+from utils import events, text_store
 from config import config
 
 documents_bp = Blueprint('documents', __name__)
@@ -23,69 +31,13 @@ def allowed_file(filename):
 
 def process_document_async(app, document_id, file_path, file_type, user_id):
     """Process document in background thread."""
-    with app.app_context():
-        db = app.db
-        try:
-            # Extract text
-            logger.info(f"Extracting text from {file_path}")
-            text = extract_text(file_path, file_type)
-            
-            if not text:
-                raise Exception("No text could be extracted from document")
-            
-            # Chunk text
-            chunks = chunk_text(text)
-            logger.info(f"Created {len(chunks)} chunks from document")
-            
-            if not chunks:
-                raise Exception("Document produced no chunks")
-            
-            # Generate embeddings in batch
-            logger.info(f"Generating embeddings for {len(chunks)} chunks")
-            embeddings = generate_embeddings_batch(chunks)
-            
-            # Store chunks
-            chunk_docs = []
-            for i, (chunk_content, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_docs.append(create_chunk(
-                    document_id=document_id,
-                    user_id=user_id,
-                    content=chunk_content,
-                    chunk_index=i,
-                    embedding=embedding
-                ))
-            
-            if chunk_docs:
-                db.document_chunks.insert_many(chunk_docs)
-            
-            # Update document status
-            db.documents.update_one(
-                {"_id": ObjectId(document_id)},
-                {"$set": {
-                    "status": "ready",
-                    "chunk_count": len(chunks),
-                    "updated_at": datetime.now(timezone.utc)
-                }}
-            )
-            logger.info(f"Document {document_id} processed successfully")
-            
-        except Exception as e:
-            logger.error(f"Document processing failed: {e}")
-            db.documents.update_one(
-                {"_id": ObjectId(document_id)},
-                {"$set": {
-                    "status": "error",
-                    "error_message": str(e),
-                    "updated_at": datetime.now(timezone.utc)
-                }}
-            )
-        finally:
-            # Clean up file
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except:
-                pass
+    ingest(app, [ingestion_item(document_id, file_path, file_type, user_id)])
+
+def start_ingestion(work, target=ingest):
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=target, args=(app, work))
+    thread.daemon = True
+    thread.start()
 
 @documents_bp.route('/upload', methods=['POST'])
 @jwt_required()
@@ -109,7 +61,8 @@ def upload_document():
     file_path = os.path.join(config.UPLOAD_FOLDER, unique_filename)
     
     os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
-    file.save(file_path)
+    with timed("save_upload"):
+        file.save(file_path)
     
     file_size = os.path.getsize(file_path)
     
@@ -124,43 +77,226 @@ def upload_document():
     result = db.documents.insert_one(doc)
     doc['_id'] = result.inserted_id
     document_id = str(result.inserted_id)
+    current_app.write_behind.submit([stats_op({
+        "documents.total": 1,
+        "documents.by_status.processing": 1
+    })])
+    
+    events.publish(db, user_id, document_id, "processing", "queued", written=True)
     
     # Process async
-    app = current_app._get_current_object()
-    thread = threading.Thread(
-        target=process_document_async,
-        args=(app, document_id, file_path, file_ext, user_id)
-    )
-    thread.daemon = True
-    thread.start()
+    start_ingestion([ingestion_item(document_id, file_path, file_ext, user_id)])
     
     return jsonify({
         "message": "Document uploaded. Processing in background.",
         "document": document_to_dict(doc)
     }), 201
 
+def _save_stream(stream, file_path, limit):
+    """Copy stream to file_path, refusing to write more than limit bytes."""
+    written = 0
+    with open(file_path, 'wb') as out:
+        while True:
+            block = stream.read(64 * 1024)
+            if not block:
+                return written
+            written += len(block)
+            if written > limit:
+                raise ValueError(f"File exceeds {limit // (1024 * 1024)}MB")
+            out.write(block)
+
+def _zip_entries(archive, budget):
+    """Yield (name, ZipInfo, None) per acceptable entry, or (name, None, reason) when skipped.
+
+    budget is a one-item list of uncompressed bytes still allowed; the caller
+    charges it as entries are written, before the next one is checked.
+    """
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+            continue
+        if not allowed_file(name):
+            yield name, None, "Only PDF and TXT files are allowed"
+        elif info.flag_bits & 0x1:
+            yield name, None, "Encrypted entries are not supported"
+        elif info.file_size > config.MAX_CONTENT_LENGTH:
+            yield name, None, f"File exceeds {config.MAX_CONTENT_LENGTH // (1024 * 1024)}MB"
+        elif info.compress_size and info.file_size / info.compress_size > config.BULK_MAX_COMPRESSION_RATIO:
+            yield name, None, "Suspicious compression ratio"
+        elif info.file_size > budget[0]:
+            yield name, None, "Upload exceeds the total size limit"
+        else:
+            yield name, info, None
+
+@documents_bp.route('/upload/bulk', methods=['POST'])
+@jwt_required()
+def upload_documents_bulk():
+    """Upload many PDF/TXT files (form field `files`) and/or ZIP archives of them.
+
+    Entries are streamed to disk, recorded with one insert_many and ingested
+    in a single background run; each file's status is reported as usual.
+    """
+    user_id = get_jwt_identity()
+    # This view alone may exceed MAX_CONTENT_LENGTH (see AppRequest in app.py)
+    if request.content_length and request.content_length > config.BULK_MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"Upload too large. Max size is {config.BULK_MAX_UPLOAD_BYTES // (1024 * 1024)}MB"}), 413
+    uploads = [f for f in request.files.getlist('files') if f.filename]
+    if not uploads:
+        return jsonify({"error": "No files provided"}), 400
+    
+    os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+    budget = [config.BULK_MAX_TOTAL_BYTES]  # uncompressed bytes left
+    accepted, rejected = [], []  # accepted: (original_name, file_type, file_path, size)
+    
+    def add(name, stream, limit):
+        file_ext = name.rsplit('.', 1)[1].lower()
+        file_path = os.path.join(config.UPLOAD_FOLDER, f"{uuid.uuid4()}.{file_ext}")
+        try:
+            size = _save_stream(stream, file_path, limit)
+        except Exception as e:
+            # Oversized, or an unreadable entry (bad CRC, truncated or unsupported compression)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            error = str(e) if isinstance(e, ValueError) else f"Could not read file: {e}"
+            rejected.append({"name": name, "error": error})
+            return
+        budget[0] -= size
+        accepted.append((name, file_ext, file_path, size))
+    
+    try:
+        with timed("save_upload"):
+            for upload in uploads:
+                name = os.path.basename(upload.filename)
+                if len(accepted) >= config.BULK_MAX_FILES:
+                    rejected.append({"name": name, "error": f"More than {config.BULK_MAX_FILES} files"})
+                elif name.lower().endswith('.zip'):
+                    try:
+                        archive = zipfile.ZipFile(upload.stream)
+                    except zipfile.BadZipFile:
+                        rejected.append({"name": name, "error": "Not a valid ZIP archive"})
+                        continue
+                    with archive:
+                        for entry_name, info, error in _zip_entries(archive, budget):
+                            if error is None and len(accepted) >= config.BULK_MAX_FILES:
+                                error = f"More than {config.BULK_MAX_FILES} files"
+                            if error:
+                                rejected.append({"name": entry_name, "error": error})
+                                continue
+                            try:
+                                entry = archive.open(info)
+                            except (zipfile.BadZipFile, NotImplementedError, RuntimeError, OSError) as e:
+                                rejected.append({"name": entry_name, "error": f"Could not read file: {e}"})
+                                continue
+                            with entry:
+                                add(entry_name, entry, min(info.file_size, config.MAX_CONTENT_LENGTH))
+                elif not allowed_file(name):
+                    rejected.append({"name": name, "error": "Only PDF, TXT and ZIP files are allowed"})
+                else:
+                    add(name, upload.stream, config.MAX_CONTENT_LENGTH)
+    except Exception:
+        for _, _, file_path, _ in accepted:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        raise
+    
+    if not accepted:
+        return jsonify({"error": "No acceptable files", "rejected": rejected}), 400
+    
+    db = current_app.db
+    docs = [create_document(
+        user_id=user_id,
+        filename=os.path.basename(file_path),
+        original_name=name,
+        file_type=file_ext,
+        file_size=size
+    ) for name, file_ext, file_path, size in accepted]
+    result = db.documents.insert_many(docs)
+    for doc, inserted_id in zip(docs, result.inserted_ids):
+        doc['_id'] = inserted_id
+    current_app.write_behind.submit([stats_op({
+        "documents.total": len(docs),
+        "documents.by_status.processing": len(docs)
+    })])
+    
+    items = []
+    for doc, (_, file_ext, file_path, _) in zip(docs, accepted):
+        document_id = str(doc['_id'])
+        events.publish(db, user_id, document_id, "processing", "queued", written=True)
+        items.append(ingestion_item(document_id, file_path, file_ext, user_id))
+    start_ingestion(items)
+    
+    return jsonify({
+        "message": f"{len(docs)} documents uploaded. Processing in background.",
+        "documents": [document_to_dict(d) for d in docs],
+        "rejected": rejected
+    }), 201
+
 @documents_bp.route('/list', methods=['GET'])
 @jwt_required()
 def list_documents():
     user_id = get_jwt_identity()
     db = current_app.db
     
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    skip = (page - 1) * limit
-    
-    docs = list(db.documents.find(
-        {"user_id": user_id},
-        sort=[("created_at", -1)]
-    ).skip(skip).limit(limit))
+    try:
+        docs, meta = paginate(db.documents, {"user_id": user_id}, "created_at", request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    total = db.documents.count_documents({"user_id": user_id})
+    if "total" in meta:
+        meta["pages"] = (meta["total"] + meta["limit"] - 1) // meta["limit"]
     
     return jsonify({
         "documents": [document_to_dict(d) for d in docs],
-        "total": total,
-        "page": page,
-        "pages": (total + limit - 1) // limit
+        **meta
+    })
+
+@documents_bp.route('/events', methods=['GET'])
+# EventSource cannot send headers; nowhere else takes tokens from the URL
+@jwt_required(locations=['headers', 'query_string'])
+def document_events():
+    """Server-sent events with status/progress for this user's documents.
+
+    Starts with a snapshot of documents still processing or finished within
+    DOCUMENT_EVENTS_SNAPSHOT_WINDOW, then pushes each change. The snapshot
+    lets a client that missed events (with the memory backend, anything that
+    finished in another worker) catch up on reconnect. EventSource cannot
+    set headers, so the JWT may be passed as ?jwt=. Answers 503 when this
+    worker already serves DOCUMENT_EVENTS_MAX_STREAMS streams.
+    """
+    user_id = get_jwt_identity()
+    db = current_app.db
+    subscription = events.subscribe(db, user_id)
+    if subscription is None:
+        # The client falls back to polling /documents/list
+        return jsonify({"error": "Too many open event streams"}), 503, {"Retry-After": "30"}
+    recent = datetime.now(timezone.utc) - timedelta(seconds=config.DOCUMENT_EVENTS_SNAPSHOT_WINDOW)
+    try:
+        pending = list(db.documents.find(
+            {"user_id": user_id, "$or": [{"status": "processing"}, {"updated_at": {"$gte": recent}}]},
+            events.EVENT_FIELDS
+        ))
+    except Exception:
+        events.unsubscribe(user_id, subscription)
+        raise
+
+    def stream():
+        try:
+            for doc in pending:
+                yield f"event: status\ndata: {json.dumps(events.to_event(doc))}\n\n"
+            deadline = time.monotonic() + config.DOCUMENT_EVENTS_MAX_AGE
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=config.DOCUMENT_EVENTS_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(user_id, subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
     })
 
 @documents_bp.route('/<document_id>', methods=['GET'])
@@ -199,13 +335,84 @@ def delete_document(document_id):
     if not doc:
         return jsonify({"error": "Document not found"}), 404
     
-    # Delete chunks
-    db.document_chunks.delete_many({"document_id": document_id})
-    # Delete document
+    # Document first: ingestion re-checks it after activating chunks, so any
+    # chunks it writes concurrently are either seen here or removed there
     db.documents.delete_one({"_id": ObjectId(document_id)})
+    db.document_chunks.delete_many({"document_id": document_id})
+    text_store.delete(db, [document_id])
+    current_app.write_behind.submit([stats_op({
+        "documents.total": -1,
+        f"documents.by_status.{doc.get('status', 'processing')}": -1,
+        "documents.total_chunks": -doc.get("chunk_count", 0)
+    })])
     
     return jsonify({"message": "Document deleted successfully"})
 
+@documents_bp.route('/<document_id>/replace', methods=['PUT'])
+@jwt_required()
+def replace_document(document_id):
+    """Upload a new revision of a document (form field `file`).
+
+    Unchanged chunks keep their embeddings and only new text is embedded;
+    the previous revision stays searchable until the new one is swapped in.
+    """
+    user_id = get_jwt_identity()
+    
+    try:
+        document_oid = ObjectId(document_id)
+    except:
+        return jsonify({"error": "Invalid document ID"}), 400
+    
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided"}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+    
+    if not allowed_file(file.filename):
+        return jsonify({"error": "Only PDF and TXT files are allowed"}), 400
+    
+    db = current_app.db
+    if not db.documents.find_one({"_id": document_oid, "user_id": user_id}, {"_id": 1}):
+        return jsonify({"error": "Document not found"}), 404
+    
+    file_ext = file.filename.rsplit('.', 1)[1].lower()
+    file_path = os.path.join(config.UPLOAD_FOLDER, f"{uuid.uuid4()}.{file_ext}")
+    os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+    with timed("save_upload"):
+        file.save(file_path)
+    file_size = os.path.getsize(file_path)
+    
+    # Claimed atomically so two revisions of one document never race
+    previous = db.documents.find_one_and_update(
+        {"_id": document_oid, "user_id": user_id, "status": {"$ne": "processing"}},
+        {"$set": {
+            "status": "processing",
+            "stage": "queued",
+            "progress": None,
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
+        os.remove(file_path)
+        return jsonify({"error": "Document is still processing"}), 409
+    
+    previous_status = previous.get("status", "ready")
+    current_app.write_behind.submit([stats_op(status_change(previous_status, "processing"))])
+    events.publish(db, user_id, document_id, "processing", "queued", written=True)
+    
+    start_ingestion(replacement_item(
+        document_id, file_path, file_ext, user_id, file.filename, file_size, previous_status
+    ), target=replace)
+    
+    return jsonify({
+        "message": "New revision uploaded. Processing in background.",
+        "document": document_to_dict({**previous, "status": "processing", "stage": "queued", "progress": None})
+    }), 202
+
 @documents_bp.route('/<document_id>/status', methods=['GET'])
 @jwt_required()
 def check_status(document_id):
@@ -0,0 +1,48 @@
+# scripts/backfill_chunk_owner.py
+"""One-off migration: copy owner and active state from documents onto their chunks.
+
+Usage (from backend/):
+    python -m scripts.backfill_chunk_owner [--mongo-uri URI] [--batch-size N]
+
+Safe to re-run; every chunk ends up with a string user_id and an is_active
+flag that is true only when its document is active and ready.
+"""
+import argparse
+import logging
+from pymongo import MongoClient, UpdateMany
+from config import config
+from models.schema import ensure_indexes
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+def backfill(db, batch_size=500):
+    ops = []
+    updated = 0
+    documents = db.documents.find({}, {"user_id": 1, "is_active": 1, "status": 1})
+    for doc in documents:
+        active = doc.get("is_active", True) and doc.get("status") == "ready"
+        ops.append(UpdateMany(
+            {"document_id": str(doc["_id"])},
+            {"$set": {"user_id": str(doc["user_id"]), "is_active": active}}
+        ))
+        if len(ops) >= batch_size:
+            updated += db.document_chunks.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.document_chunks.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=config.MONGO_URI)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.mongo_uri).get_default_database()
+    ensure_indexes(db)
+    updated = backfill(db, args.batch_size)
+    logger.info(f"Backfilled owner/active state on {updated} chunks")
+
+if __name__ == "__main__":
+    main()
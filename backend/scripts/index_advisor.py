@@ -0,0 +1,67 @@
+# scripts/index_advisor.py
+"""Explain every route query shape and flag collection scans and in-memory sorts.
+
+Usage (from backend/):
+    python -m scripts.index_advisor [--mongo-uri URI] [--create-indexes]
+
+Exits with status 1 if any query shape needs attention.
+"""
+import argparse
+import sys
+from pymongo import MongoClient
+from config import config
+from models.schema import QUERY_SHAPES, ensure_indexes
+
+def _stages(plan):
+    """Yield every stage of an explain plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+def explain_shape(db, shape):
+    cursor = db[shape["collection"]].find(shape["filter"], shape.get("projection"))
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    if shape.get("limit"):
+        cursor = cursor.limit(shape["limit"])
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+
+    stages = [s["stage"] for s in _stages(plan)]
+    indexes = [s.get("indexName") for s in _stages(plan) if s.get("indexName")]
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("collection scan")
+    if "SORT" in stages:
+        problems.append("in-memory sort")
+    return {"stages": stages, "indexes": indexes, "problems": problems}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=config.MONGO_URI)
+    parser.add_argument("--create-indexes", action="store_true",
+                        help="create the declared indexes before explaining")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.mongo_uri).get_default_database()
+    if args.create_indexes:
+        ensure_indexes(db)
+
+    flagged = 0
+    for shape in QUERY_SHAPES:
+        report = explain_shape(db, shape)
+        status = "FLAG" if report["problems"] else "ok"
+        detail = ", ".join(report["problems"]) or ", ".join(report["indexes"]) or "-"
+        print(f"[{status:4}] {shape['name']:<36} {' > '.join(report['stages'])}  ({detail})")
+        flagged += bool(report["problems"])
+
+    print(f"\n{len(QUERY_SHAPES)} query shapes explained, {flagged} flagged")
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# scripts/ingest_dir.py
+"""Bulk-ingest a local directory of PDF/TXT files without going through HTTP.
+
+Usage (from backend/):
+    python -m scripts.ingest_dir /data/handbooks --user admin@example.com \\
+        [--workers 8] [--embed-batch 512] [--checkpoint PATH] [--retry-errors]
+
+Extraction and chunking fan out over a process pool; embeddings are computed
+in large cross-file batches in this process (or by the embedding service when
+EMBEDDING_SERVICE_ADDRESS is set); chunks are written with unordered
+bulk_write. Progress is appended to a JSONL checkpoint after every batch is
+committed, so an interrupted run resumes where it stopped. Documents left
+half-written by an interrupted run are removed and redone. Extracted text is
+compressed in the workers and stored for later rechunking.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import MongoClient, InsertOne, UpdateOne
+from config import config
+from models.document import create_document, create_chunk
+from models.schema import ensure_indexes
+from utils.chunker import extract_text, chunk_text
+from utils.stats import reconcile_stats
+from utils import text_store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {".pdf": "pdf", ".txt": "txt"}
+
+def find_files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            ext = os.path.splitext(name)[1].lower()
+            if ext in EXTENSIONS and not name.startswith('.'):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root), EXTENSIONS[ext]
+
+def extract_file(root, relpath, file_type):
+    """Pool worker: returns (relpath, file_type, size, chunks, error, encoded text)."""
+    path = os.path.join(root, relpath)
+    try:
+        text = extract_text(path, file_type)
+        if not text:
+            raise Exception("No text could be extracted from document")
+        chunks = chunk_text(text)
+        if not chunks:
+            raise Exception("Document produced no chunks")
+        return relpath, file_type, os.path.getsize(path), chunks, None, text_store.encode(text)
+    except Exception as e:
+        return relpath, file_type, 0, None, str(e), None
+
+class Checkpoint:
+    """Append-only JSONL of {"path", "status", ...}; the last line per path wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        self.entries[entry["path"]] = entry
+        self._file = open(path, "a")
+
+    def should_skip(self, relpath, retry_errors):
+        entry = self.entries.get(relpath)
+        if entry is None:
+            return False
+        return entry["status"] == "done" or not retry_errors
+
+    def record(self, entries):
+        for entry in entries:
+            self.entries[entry["path"]] = entry
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def resolve_user(db, ref):
+    query = {"$or": [{"email": ref.lower()}, {"username": ref}]}
+    if ObjectId.is_valid(ref):
+        query["$or"].append({"_id": ObjectId(ref)})
+    user = db.users.find_one(query, {"_id": 1})
+    return str(user["_id"]) if user else None
+
+def clean_interrupted(db, user_id, root):
+    """Remove documents (and chunks) a previous run created but did not finish."""
+    stale = [str(d["_id"]) for d in db.documents.find(
+        {"user_id": user_id, "status": "processing", "source_root": root}, {"_id": 1}
+    )]
+    if stale:
+        db.document_chunks.delete_many({"document_id": {"$in": stale}})
+        text_store.delete(db, stale)
+        db.documents.delete_many({"_id": {"$in": [ObjectId(d) for d in stale]}})
+        logger.info(f"Removed {len(stale)} half-ingested documents from an interrupted run")
+
+class Ingester:
+    def __init__(self, db, user_id, root, embedding_model, write_batch, checkpoint):
+        self.db = db
+        self.user_id = user_id
+        self.root = root
+        self.embedding_model = embedding_model
+        self.write_batch = write_batch
+        self.checkpoint = checkpoint
+        self.files = 0
+        self.chunks = 0
+        self.errors = 0
+
+    def commit(self, results):
+        """Store one batch of extracted files: documents, embeddings, chunks, status."""
+        from utils.embeddings import generate_embeddings_batch
+
+        docs = []
+        for relpath, file_type, size, chunks, _, _ in results:
+            doc = create_document(self.user_id, relpath, os.path.basename(relpath), file_type, size)
+            doc["source_root"] = self.root
+            docs.append(doc)
+        ids = [str(i) for i in self.db.documents.insert_many(docs).inserted_ids]
+        self.db.document_texts.insert_many([
+            text_store.record(document_id, self.user_id, r[5]) for document_id, r in zip(ids, results)
+        ], ordered=False)
+
+        texts = [chunk for r in results for chunk in r[3]]
+        vectors = generate_embeddings_batch(texts, batch_size=64, model_name=self.embedding_model)
+
+        ops, offset = [], 0
+        for document_id, (_, _, _, chunks, _, _) in zip(ids, results):
+            for i, content in enumerate(chunks):
+                ops.append(InsertOne(create_chunk(
+                    document_id=document_id,
+                    user_id=self.user_id,
+                    content=content,
+                    chunk_index=i,
+                    embedding=vectors[offset + i],
+                    embedding_model=self.embedding_model
+                )))
+            offset += len(chunks)
+        for start in range(0, len(ops), self.write_batch):
+            self.db.document_chunks.bulk_write(ops[start:start + self.write_batch], ordered=False)
+
+        self.db.document_chunks.update_many({"document_id": {"$in": ids}}, {"$set": {"is_active": True}})
+        now = datetime.now(timezone.utc)
+        self.db.documents.bulk_write([UpdateOne(
+            {"_id": ObjectId(document_id)},
+            {"$set": {"status": "ready", "chunk_count": len(r[3]), "updated_at": now}}
+        ) for document_id, r in zip(ids, results)], ordered=False)
+
+        self.checkpoint.record([
+            {"path": r[0], "status": "done", "document_id": document_id, "chunks": len(r[3])}
+            for document_id, r in zip(ids, results)
+        ])
+        self.files += len(results)
+        self.chunks += len(texts)
+
+    def record_error(self, relpath, error):
+        logger.warning(f"Skipping {relpath}: {error}")
+        self.checkpoint.record([{"path": relpath, "status": "error", "error": error}])
+        self.errors += 1
+
+def run(args):
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        sys.exit(f"Not a directory: {root}")
+
+    db = MongoClient(args.mongo_uri).get_default_database()
+    ensure_indexes(db)
+    user_id = resolve_user(db, args.user)
+    if not user_id:
+        sys.exit(f"User not found: {args.user}")
+
+    from utils.embedding_versions import get_active_model
+    embedding_model = args.model or get_active_model(db)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(root, ".ingest_checkpoint.jsonl"))
+    clean_interrupted(db, user_id, root)
+
+    todo = [(p, t) for p, t in find_files(root) if not checkpoint.should_skip(p, args.retry_errors)]
+    if args.limit:
+        todo = todo[:args.limit]
+    logger.info(f"{len(todo)} files to ingest for user {user_id} with {embedding_model} "
+                f"({len(checkpoint.entries)} already in checkpoint)")
+
+    ingester = Ingester(db, user_id, root, embedding_model, args.write_batch, checkpoint)
+    started = last_report = time.monotonic()
+    pending, pending_chunks = [], 0
+    max_in_flight = args.workers * 4
+
+    def report(final=False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(f"{'Done: ' if final else ''}{ingester.files} files, {ingester.chunks} chunks, "
+                    f"{ingester.errors} errors in {elapsed:.1f}s: "
+                    f"{ingester.files / elapsed:.2f} files/s, {ingester.chunks / elapsed:.1f} chunks/s")
+
+    try:
+        # spawn: workers must not inherit the embedding model or its threads
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            remaining = iter(todo)
+            in_flight = set()
+            while True:
+                # Bounded submission keeps extracted text from piling up in memory
+                while len(in_flight) < max_in_flight:
+                    nxt = next(remaining, None)
+                    if nxt is None:
+                        break
+                    in_flight.add(pool.submit(extract_file, root, *nxt))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result[4]:
+                        ingester.record_error(result[0], result[4])
+                        continue
+                    pending.append(result)
+                    pending_chunks += len(result[3])
+                if pending_chunks >= args.embed_batch:
+                    ingester.commit(pending)
+                    pending, pending_chunks = [], 0
+                if time.monotonic() - last_report >= args.report_every:
+                    report()
+                    last_report = time.monotonic()
+            if pending:
+                ingester.commit(pending)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; re-run the same command to resume from the checkpoint")
+        raise
+    finally:
+        checkpoint.close()
+        report(final=True)
+
+    reconcile_stats(db)
+    return ingester
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--user", required=True, help="Owner: email, username or user ID")
+    parser.add_argument("--mongo-uri", default=config.MONGO_URI)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Extraction processes")
+    parser.add_argument("--embed-batch", type=int, default=512,
+                        help="Chunks accumulated before each embedding/write batch")
+    parser.add_argument("--write-batch", type=int, default=1000, help="Operations per bulk_write")
+    parser.add_argument("--model", help="Embedding model (default: the active model)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <directory>/.ingest_checkpoint.jsonl)")
+    parser.add_argument("--retry-errors", action="store_true", help="Retry files that failed before")
+    parser.add_argument("--limit", type=int, help="Ingest at most N files")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    run(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    main()
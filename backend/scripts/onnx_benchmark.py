@@ -0,0 +1,82 @@
+# scripts/onnx_benchmark.py
+"""Compare the ONNX embedding backend against sentence-transformers (torch).
+
+Usage (from backend/):
+    python -m scripts.onnx_benchmark [--texts 512] [--batch-size 64] [--export]
+
+Reports minimum/mean cosine similarity between backends, batch throughput in
+chunks/sec and single-query latency. Exits with status 1 if the ONNX vectors
+drift beyond the stated tolerance (0.999 fp32, 0.98 int8).
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from config import config
+from utils.embeddings import onnx_dir
+from utils.onnx_embeddings import export_onnx, OnnxEncoder
+
+TOLERANCE = {False: 0.999, True: 0.98}
+
+_WORDS = ("report revenue quarter growth policy employee customer contract "
+          "security incident budget forecast product launch roadmap").split()
+
+def synthetic_texts(n, words=200, seed=7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_WORDS) for _ in range(words)) for _ in range(n)]
+
+def throughput(encoder, texts, batch_size):
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return len(texts) / (time.perf_counter() - start)
+
+def query_latency_ms(encoder, queries):
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        encoder.encode([q], convert_to_numpy=True, show_progress_bar=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main(argv=None):
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--export", action="store_true", help="re-export before benchmarking")
+    args = parser.parse_args(argv)
+
+    model_name = args.model
+    model_dir = onnx_dir(model_name)
+    if args.export:
+        export_onnx(model_name, model_dir, quantize=True)
+
+    texts = synthetic_texts(args.texts)
+    queries = synthetic_texts(50, words=12, seed=11)
+    encoders = {"torch": SentenceTransformer(model_name, device="cpu")}
+    for quantized in (False, True):
+        encoders["onnx-int8" if quantized else "onnx-fp32"] = OnnxEncoder(model_dir, quantized=quantized)
+
+    reference = encoders["torch"].encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+
+    failed = False
+    print(f"{'backend':<10} {'chunks/sec':>11} {'query p50 ms':>13} {'min cos':>9} {'mean cos':>9}")
+    for name, encoder in encoders.items():
+        vectors = encoder.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        cosines = (vectors * reference).sum(axis=1)
+        rate = throughput(encoder, texts, args.batch_size)
+        latency = query_latency_ms(encoder, queries)
+        print(f"{name:<10} {rate:>11.1f} {latency:>13.2f} {cosines.min():>9.5f} {cosines.mean():>9.5f}")
+        if name != "torch" and cosines.min() < TOLERANCE[name == "onnx-int8"]:
+            print(f"FAIL: {name} min cosine {cosines.min():.5f} below tolerance {TOLERANCE[name == 'onnx-int8']}")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+# scripts/onnx_export.py
+"""Export embedding models for the ONNX backend (EMBEDDING_BACKEND=onnx).
+
+Usage (from backend/):
+    python -m scripts.onnx_export [--model NAME ...] [--no-quantize]
+
+Writes each model to EMBEDDING_ONNX_DIR, with an int8 copy unless
+--no-quantize. Needs torch and sentence-transformers, which serving does
+not: run it at build time, and again for the target model before starting
+a re-embed with the ONNX backend.
+"""
+import argparse
+import sys
+from config import config
+from utils.embeddings import onnx_dir
+from utils.onnx_embeddings import export_onnx
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", action="append",
+                        help=f"model to export, repeatable (default {config.EMBEDDING_MODEL})")
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 copy")
+    args = parser.parse_args(argv)
+
+    for model_name in args.model or [config.EMBEDDING_MODEL]:
+        meta = export_onnx(model_name, onnx_dir(model_name), quantize=not args.no_quantize)
+        print(f"{model_name}: dimension {meta['dimension']}, written to {onnx_dir(model_name)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# scripts/roundtrip_check.py
+"""Count MongoDB round trips per admin list request at two page sizes.
+
+Usage (from backend/):
+    python -m scripts.roundtrip_check [--mongo-uri URI] [--small 5] [--large 25]
+
+Seeds synthetic data (benchmarks/seed.py), then requests each list endpoint
+with a cold cache at both page sizes while a pymongo CommandListener counts
+the commands sent. A list page must cost the same number of round trips
+however many rows it has; exits with status 1 if the counts differ, which
+means a per-row lookup crept back in.
+
+Never point --mongo-uri at a real database: the seed step drops collections.
+"""
+import argparse
+import os
+import sys
+import threading
+from collections import Counter
+from pymongo import MongoClient, monitoring
+
+ENDPOINTS = ["/admin/documents", "/admin/queries"]
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = Counter()
+
+    def reset(self):
+        with self._lock:
+            self.commands = Counter()
+
+    def started(self, event):
+        with self._lock:
+            self.commands[f"{event.command_name} {event.command.get(event.command_name, '')}"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def _cold_caches():
+    from utils import pagination, user_cache
+    with user_cache._lock:
+        user_cache._cache.clear()
+        user_cache._access_cache.clear()
+    with pagination._count_lock:
+        pagination._count_cache.clear()
+
+def count_roundtrips(app, counter, headers, path, limit):
+    """Return (status code, rows, Counter of commands) for one cold request."""
+    _cold_caches()
+    counter.reset()
+    response = app.test_client().get(f"{path}?limit={limit}", headers=headers)
+    commands = counter.commands
+    body = response.get_json() or {}
+    rows = next((len(v) for v in body.values() if isinstance(v, list)), 0)
+    return response.status_code, rows, commands
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/ka_bench"))
+    parser.add_argument("--small", type=int, default=5, help="smaller page size")
+    parser.add_argument("--large", type=int, default=25, help="larger page size")
+    args = parser.parse_args(argv)
+
+    from benchmarks.seed import seed
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+
+    counter = CommandCounter()
+    db = MongoClient(args.mongo_uri, event_listeners=[counter]).get_default_database()
+    # One document and one message pair per user, so every row on a page has a different owner
+    seeded = seed(db, users=args.large + 1, chunks=args.large + 1, docs_per_user=1,
+                  sessions_per_user=1, messages_per_session=2)
+    app = create_app(db)
+    with app.app_context():
+        token = create_access_token(identity=seeded["users"][0]["id"], additional_claims={"role": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    failures = []
+    for path in ENDPOINTS:
+        results = {}
+        for limit in (args.small, args.large):
+            status, rows, commands = count_roundtrips(app, counter, headers, path, limit)
+            if status != 200:
+                failures.append(f"{path}?limit={limit} answered {status}")
+                continue
+            results[limit] = sum(commands.values())
+            detail = ", ".join(f"{name} x{n}" for name, n in sorted(commands.items()))
+            print(f"{path:<18} limit={limit:<4} rows={rows:<4} round trips={results[limit]:<3} ({detail})")
+        if len(set(results.values())) > 1:
+            failures.append(f"{path} round trips grow with page size: "
+                            f"{results[args.small]} at {args.small}, {results[args.large]} at {args.large}")
+
+    app.write_behind.flush()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
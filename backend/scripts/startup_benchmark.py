@@ -0,0 +1,99 @@
+# scripts/startup_benchmark.py
+"""Measure app import time and post-create_app RSS, failing on regressions.
+
+Usage (from backend/):
+    python -m scripts.startup_benchmark [--max-import-ms 1500] [--max-rss-mb 250]
+
+Runs in fresh interpreters with EMBEDDING_WARMUP=off, parses `-X importtime`
+output, and checks that heavy dependencies are not imported at boot,
+neither by `import app` nor by create_app().
+Exits with status 1 when a budget is exceeded, so CI can track it.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Dependencies that must only load on the code paths that need them
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "groq", "onnxruntime"]
+
+_RSS_PROBE = """
+import json, resource, sys
+from app import create_app
+create_app()
+print(json.dumps({
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy_loaded": [m for m in %r if m in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+def _env():
+    env = dict(os.environ)
+    env["EMBEDDING_WARMUP"] = "off"
+    return env
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure_import(module="app"):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True
+    )
+    modules = parse_importtime(proc.stderr)
+    total_us = sum(self_us for self_us, _ in modules.values())
+    top = sorted(modules.items(), key=lambda kv: kv[1][0], reverse=True)[:10]
+    return total_us / 1000, modules, top
+
+def measure_rss():
+    """Return (RSS in MB, heavy modules loaded) after create_app()."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _RSS_PROBE],
+        capture_output=True, text=True, env=_env(), check=True
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["max_rss_kb"] / 1024, result["heavy_loaded"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-rss-mb", type=float, default=250)
+    parser.add_argument("--skip-rss", action="store_true",
+                        help="skip create_app() (it needs a reachable mongod)")
+    args = parser.parse_args(argv)
+
+    failures = []
+    import_ms, modules, top = measure_import()
+    print(f"import app: {import_ms:.0f} ms across {len(modules)} modules")
+    for name, (self_us, _) in top:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+
+    loaded = [m for m in HEAVY_MODULES if m in modules]
+    if loaded:
+        failures.append(f"heavy modules imported at boot: {', '.join(loaded)}")
+
+    if not args.skip_rss:
+        rss_mb, loaded = measure_rss()
+        print(f"RSS after create_app(): {rss_mb:.0f} MB")
+        if rss_mb > args.max_rss_mb:
+            failures.append(f"RSS {rss_mb:.0f} MB > {args.max_rss_mb:.0f} MB")
+        # create_app() imports the blueprints, which `import app` alone does not reach
+        if loaded:
+            failures.append(f"heavy modules imported by create_app(): {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,25 @@
 # utils/chunker.py
 import re
+import zlib
 from config import config
 
-def chunk_text(text, chunk_size=None, overlap=None):
-    """Split text into overlapping chunks by word count."""
-    chunk_size = chunk_size or config.CHUNK_SIZE
-    overlap = overlap or config.CHUNK_OVERLAP
+# Words hashed to decide a content-defined boundary
+BOUNDARY_WINDOW = 4
+
+def chunk_text(text, chunk_size=None, overlap=None, strategy=None):
+    """Split text into overlapping chunks of about chunk_size words.
+
+    strategy "fixed" cuts every chunk_size words. "content" (the default,
+    see CHUNK_STRATEGY) cuts where a hash of the last few words hits, so
+    an edit only moves the boundaries next to it and the rest of a revised
+    document chunks exactly as before.
+    """
+    chunk_size = config.CHUNK_SIZE if chunk_size is None else chunk_size
+    overlap = config.CHUNK_OVERLAP if overlap is None else overlap
+    strategy = strategy or config.CHUNK_STRATEGY
+    if not 0 <= overlap < chunk_size:
+        # The fixed loop would never advance
+        raise ValueError(f"overlap must be at least 0 and less than chunk_size (got {overlap}, {chunk_size})")
     
     # Clean text
     text = re.sub(r'\s+', ' ', text).strip()
@@ -14,6 +28,10 @@ def chunk_text(text, chunk_size=None, overlap=None):
         return []
     
     words = text.split()
+    if strategy == "content":
+        return [' '.join(words[max(0, start - overlap):end])
+                for start, end in _content_defined_spans(words, chunk_size)]
+    
     chunks = []
     start = 0
     
@@ -32,6 +50,30 @@ def chunk_text(text, chunk_size=None, overlap=None):
     
     return chunks
 
+def _content_defined_spans(words, chunk_size):
+    """(start, end) word spans between content-defined boundaries.
+
+    Spans are at least chunk_size / 2 words; past that a boundary falls with
+    probability 1 / (chunk_size / 2) per word, averaging about chunk_size,
+    and a span is forced closed at 1.5 * chunk_size.
+    """
+    min_size = max(1, chunk_size // 2)
+    max_size = max(min_size, chunk_size + chunk_size // 2)
+    divisor = max(1, chunk_size - min_size)
+    spans = []
+    start = 0
+    for i in range(len(words)):
+        size = i - start + 1
+        if size < min_size:
+            continue
+        window = ' '.join(words[max(start, i - BOUNDARY_WINDOW + 1):i + 1])
+        if size >= max_size or zlib.crc32(window.encode('utf-8')) % divisor == 0:
+            spans.append((start, i + 1))
+            start = i + 1
+    if start < len(words):
+        spans.append((start, len(words)))
+    return spans
+
 def extract_text_from_pdf(file_path):
     """Extract text from a PDF file."""
     try:
@@ -0,0 +1,73 @@
+# utils/context_cache.py
+"""Per-session ring buffer of recent conversation turns for /chat/ask.
+
+Entries are keyed by session ID and hold the last CONTEXT_CACHE_TURNS
+messages plus the message count they reflect. A cached entry is trusted
+while its count is at least the session document's message_count: the
+count can only be ahead because this worker's own writes are still in the
+write-behind queue. If another worker appended turns, the session count
+moves past ours and the entry is rebuilt from MongoDB.
+"""
+import threading
+from collections import OrderedDict, deque
+from config import config
+from utils.metrics import cache_event
+
+HISTORY_PROJECTION = {"_id": 0, "role": 1, "content": 1}
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+def _store(session_id, count, turns):
+    entry = {"count": count, "turns": deque(turns, maxlen=config.CONTEXT_CACHE_TURNS)}
+    with _lock:
+        _entries[session_id] = entry
+        _entries.move_to_end(session_id)
+        while len(_entries) > config.CONTEXT_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+def load_history(db, session, user_id):
+    """Return (turns, count): the most recent turns oldest first, and the count they reflect.
+
+    Pass count back to append_turns once the new turns are written.
+    """
+    session_id = str(session["_id"])
+    expected = session.get("message_count", 0)
+    with _lock:
+        entry = _entries.get(session_id)
+        if entry is not None and entry["count"] >= expected:
+            _entries.move_to_end(session_id)
+            cache_event("session_context", True)
+            return list(entry["turns"]), entry["count"]
+    cache_event("session_context", False)
+
+    newest_first = list(db.messages.find(
+        {"session_id": session_id, "user_id": user_id},
+        HISTORY_PROJECTION,
+        sort=[("created_at", -1)]
+    ).limit(config.CONTEXT_CACHE_TURNS))
+    turns = newest_first[::-1]
+    _store(session_id, expected, turns)
+    return turns, expected
+
+def start_session(session_id):
+    """Seed an empty entry for a session created by this worker."""
+    _store(str(session_id), 0, [])
+
+def append_turns(session_id, turns, previous_count):
+    """Record turns written for a session whose history was read at previous_count."""
+    session_id = str(session_id)
+    with _lock:
+        entry = _entries.get(session_id)
+        if entry is None:
+            return
+        if entry["count"] != previous_count:
+            # A concurrent ask on the same session got here first; rebuild next time
+            del _entries[session_id]
+            return
+        entry["turns"].extend({"role": t["role"], "content": t["content"]} for t in turns)
+        entry["count"] += len(turns)
+
+def invalidate(session_id):
+    with _lock:
+        _entries.pop(str(session_id), None)
@@ -0,0 +1,99 @@
+# utils/embedding_client.py
+"""Client side of the embedding worker protocol (see embedding_worker.py).
+
+Messages are JSON over multiprocessing connections, never pickles, so a
+peer that gets past the handshake still cannot run code in the worker or
+the API. A TCP address needs a dedicated EMBEDDING_SERVICE_AUTHKEY; a unix
+socket may go without one and rely on the socket's file permissions.
+"""
+import json
+import threading
+from multiprocessing.connection import Client
+from config import config
+
+WEAK_AUTHKEYS = {"change-this-secret"}
+
+def parse_address(address):
+    """'host:port' -> (host, port) for TCP, anything else is a unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+def service_authkey(address, authkey):
+    """Return the handshake key for address, or None for a keyless unix socket.
+
+    Raises ValueError for a TCP address without a dedicated key.
+    """
+    if not authkey:
+        if isinstance(address, tuple):
+            raise ValueError("EMBEDDING_SERVICE_AUTHKEY must be set when EMBEDDING_SERVICE_ADDRESS is host:port")
+        return None
+    if authkey in WEAK_AUTHKEYS or authkey == config.JWT_SECRET:
+        raise ValueError("EMBEDDING_SERVICE_AUTHKEY must be a dedicated secret, not the default or JWT_SECRET")
+    return authkey.encode("utf-8")
+
+def send_message(conn, message):
+    conn.send_bytes(json.dumps(message).encode("utf-8"))
+
+def recv_message(conn):
+    return json.loads(conn.recv_bytes())
+
+class EmbeddingClient:
+    """Thin client for embedding_worker.py; one connection per calling thread."""
+
+    def __init__(self, address, authkey, timeout=None):
+        self.address = parse_address(address)
+        self.authkey = service_authkey(self.address, authkey)
+        self.timeout = timeout or config.EMBEDDING_SERVICE_TIMEOUT
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def encode(self, texts, model_name=None):
+        # One retry on a fresh connection covers worker restarts
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                send_message(conn, {"texts": [t[:2000] for t in texts], "model": model_name})
+                if not conn.poll(self.timeout):
+                    # A late reply would answer the next request; drop the connection.
+                    # Not retried: a stuck worker would only get more work.
+                    self._reset()
+                    raise TimeoutError(f"Embedding worker did not reply within {self.timeout:g}s")
+                reply = recv_message(conn)
+                break
+            except TimeoutError:
+                raise
+            except (OSError, EOFError):
+                self._reset()
+                if attempt:
+                    raise
+        if "error" in reply:
+            raise Exception(f"Embedding worker error: {reply['error']}")
+        return reply["embeddings"]
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = EmbeddingClient(config.EMBEDDING_SERVICE_ADDRESS, config.EMBEDDING_SERVICE_AUTHKEY)
+    return _client
@@ -0,0 +1,208 @@
+# utils/embedding_versions.py
+"""Active embedding model tracking and background re-embedding.
+
+Every chunk records the model that produced its vector (`embedding_model`,
+`embedding_dim`). The model used for retrieval lives in the `settings`
+collection, so switching models is one atomic write:
+
+1. The re-embed job walks `document_chunks` in _id order and writes vectors
+   for the target model into shadow fields (`embedding_shadow*`), throttled.
+2. Cutover flips `active_model` to the target. Retrieval scores whichever
+   of `embedding` / `embedding_shadow` matches the active model, so there is
+   no window where a chunk has no usable vector.
+3. After every worker has picked up the new model, shadows are promoted into
+   `embedding` and stragglers (chunks ingested mid-job) are re-embedded.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from config import config
+from utils import jobs
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_ID = "embedding"
+
+_active = {"model": None, "expires": 0.0}
+_active_lock = threading.Lock()
+
+def get_active_model(db):
+    """Model used for retrieval and ingestion, cached per process for ACTIVE_MODEL_CACHE_TTL."""
+    now = time.monotonic()
+    if _active["model"] and _active["expires"] > now:
+        return _active["model"]
+    state = db.settings.find_one({"_id": SETTINGS_ID}, {"active_model": 1})
+    model = (state or {}).get("active_model") or config.EMBEDDING_MODEL
+    with _active_lock:
+        _active.update(model=model, expires=now + config.ACTIVE_MODEL_CACHE_TTL)
+    return model
+
+def model_filter(active_model):
+    """Chunks that hold a vector for active_model, in either field."""
+    models = [active_model]
+    if active_model == config.EMBEDDING_MODEL:
+        # Chunks stored before versioning carry no tag and came from the default model
+        models.append(None)
+    return {"$or": [
+        {"embedding_model": {"$in": models}},
+        {"embedding_shadow_model": active_model}
+    ]}
+
+def vector_for(chunk, active_model):
+    if chunk.get("embedding_shadow_model") == active_model:
+        return chunk.get("embedding_shadow")
+    return chunk.get("embedding")
+
+def get_state(db):
+    state = db.settings.find_one({"_id": SETTINGS_ID}) or {}
+    job = state.get("job") or {}
+    return {
+        "active_model": state.get("active_model") or config.EMBEDDING_MODEL,
+        "active_dim": state.get("active_dim"),
+        "target_model": state.get("target_model"),
+        "job": {
+            "status": job.get("status", "idle"),
+            "phase": job.get("phase"),
+            "processed": job.get("processed", 0),
+            "total": job.get("total", 0),
+            "error": job.get("error"),
+            "owner": job.get("owner"),
+            "heartbeat_at": job["heartbeat_at"].isoformat() if job.get("heartbeat_at") else None,
+            "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+            "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None
+        }
+    }
+
+def start_reembed(app, target_model, batch_size=None, pause_ms=None):
+    """Claim the job slot and start re-embedding in a background thread.
+
+    Returns False if a live job is already running (see utils/jobs.py).
+    """
+    db = app.db
+    batch_size = batch_size or config.REEMBED_BATCH_SIZE
+    pause = (pause_ms if pause_ms is not None else config.REEMBED_PAUSE_MS) / 1000
+    lease = jobs.claim(db, SETTINGS_ID, {
+        "status": "running",
+        "phase": "shadow",
+        "processed": 0,
+        "total": db.document_chunks.estimated_document_count(),
+        "started_at": datetime.now(timezone.utc),
+        "finished_at": None,
+        "error": None
+    }, extra={"target_model": target_model})
+    if lease is None:
+        return False
+
+    thread = threading.Thread(
+        target=run_reembed,
+        args=(app, lease, target_model, batch_size, pause),
+        daemon=True
+    )
+    thread.start()
+    return True
+
+def cancel_reembed(db):
+    # Shadow vectors a dead job left behind are overwritten by the next job
+    return jobs.cancel(db, SETTINGS_ID, extra={"target_model": None})
+
+def _embed_pass(db, lease, target_model, batch_size, pause, shadow):
+    """Walk chunks lacking a target_model vector in _id order. Returns (count, dim) or None if cancelled."""
+    from utils.embeddings import generate_embeddings_batch
+
+    prefix = "embedding_shadow" if shadow else "embedding"
+    last_id = None
+    processed, dim = 0, None
+    while True:
+        if lease.stopping():
+            return None
+        query = {
+            "embedding_model": {"$ne": target_model},
+            "embedding_shadow_model": {"$ne": target_model}
+        }
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(db.document_chunks.find(query, {"content": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return processed, dim
+
+        vectors = generate_embeddings_batch([c["content"] for c in batch], batch_size, model_name=target_model)
+        dim = len(vectors[0]) if vectors else dim
+        db.document_chunks.bulk_write([
+            UpdateOne({"_id": c["_id"]}, {"$set": {
+                prefix: vector,
+                f"{prefix}_model": target_model,
+                f"{prefix}_dim": len(vector)
+            }})
+            for c, vector in zip(batch, vectors)
+        ], ordered=False)
+
+        processed += len(batch)
+        last_id = batch[-1]["_id"]
+        lease.update({"$inc": {"job.processed": len(batch)}})
+        time.sleep(pause)
+
+def run_reembed(app, lease, target_model, batch_size, pause):
+    db = app.db
+    with lease:
+        _run_reembed(db, lease, target_model, batch_size, pause)
+
+def _run_reembed(db, lease, target_model, batch_size, pause):
+    try:
+        logger.info(f"Re-embedding chunks with {target_model}")
+        result = _embed_pass(db, lease, target_model, batch_size, pause, shadow=True)
+        if result is None:
+            if lease.lost:
+                logger.warning("Re-embedding stopped: job taken over by another process")
+                return
+            lease.update({"$set": {
+                "target_model": None,
+                "job.status": "cancelled",
+                "job.finished_at": datetime.now(timezone.utc)
+            }})
+            db.document_chunks.update_many(
+                {"embedding_shadow_model": target_model},
+                {"$unset": {"embedding_shadow": "", "embedding_shadow_model": "", "embedding_shadow_dim": ""}}
+            )
+            logger.info("Re-embedding cancelled")
+            return
+        _, dim = result
+
+        # Atomic cutover: one write switches retrieval to the new model
+        if lease.update({"$set": {
+            "active_model": target_model,
+            "active_dim": dim,
+            "target_model": None,
+            "job.phase": "promote"
+        }}).matched_count == 0:
+            logger.warning("Re-embedding stopped before cutover: job taken over by another process")
+            return
+        logger.info(f"Active embedding model is now {target_model}")
+
+        # Let every worker's cached active model expire before old vectors go away
+        time.sleep(config.ACTIVE_MODEL_CACHE_TTL + 1)
+        db.document_chunks.update_many(
+            {"embedding_shadow_model": target_model},
+            [
+                {"$set": {
+                    "embedding": "$embedding_shadow",
+                    "embedding_model": "$embedding_shadow_model",
+                    "embedding_dim": "$embedding_shadow_dim"
+                }},
+                {"$unset": ["embedding_shadow", "embedding_shadow_model", "embedding_shadow_dim"]}
+            ]
+        )
+
+        # Chunks ingested with the old model while the job ran
+        lease.set(phase="sweep")
+        if _embed_pass(db, lease, target_model, batch_size, pause, shadow=False) is None:
+            # The new model is active; chunks not swept yet have no vector for it
+            logger.warning(f"Re-embedding sweep stopped; some chunks still lack a {target_model} vector")
+            lease.set(status="cancelled", finished_at=datetime.now(timezone.utc))
+            return
+        lease.set(status="completed", phase=None, finished_at=datetime.now(timezone.utc))
+        logger.info(f"Re-embedding with {target_model} completed")
+    except Exception as e:
+        logger.error(f"Re-embedding failed: {e}")
+        lease.set(status="error", error=str(e), finished_at=datetime.now(timezone.utc))
@@ -64,46 +64,124 @@
 
 
 # utils/embeddings.py
-import numpy as np
-from sentence_transformers import SentenceTransformer
+# numpy and sentence_transformers (torch) are imported on first use so that
+# importing this module, and the blueprints that use it, stays cheap.
 import logging
+import os
+import threading
+import time
+from config import config
+from utils import tracing
 
 logger = logging.getLogger(__name__)
 
-_model = None
-
-def get_model():
-    global _model
-    if _model is None:
-        logger.info("Loading embedding model...")
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("Embedding model ready!")
-    return _model
-
-def generate_embedding(text):
+_models = {}
+_model_lock = threading.Lock()
+_warm_pid = None
+# Set by warm_up to the active model (see utils/embedding_versions.py)
+_default_model = None
+
+def onnx_dir(model_name):
+    return os.path.join(config.EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+
+def default_model():
+    return _default_model or config.EMBEDDING_MODEL
+
+def get_model(model_name=None):
+    """Return the encoder for model_name (default: the model warmed at startup), loading it once."""
+    model_name = model_name or default_model()
+    model = _models.get(model_name)
+    if model is None:
+        with _model_lock:
+            model = _models.get(model_name)
+            if model is None:
+                logger.info(f"Loading embedding model {model_name} ({config.EMBEDDING_BACKEND} backend)...")
+                if config.EMBEDDING_BACKEND == "onnx":
+                    from utils.onnx_embeddings import load_onnx_encoder
+                    model = load_onnx_encoder(
+                        model_name,
+                        onnx_dir(model_name),
+                        quantized=config.EMBEDDING_ONNX_QUANTIZED
+                    )
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(model_name)
+                _models[model_name] = model
+                logger.info("Embedding model ready!")
+    return model
+
+def warm_up(encode=True, model_name=None):
+    """Load the model and, unless encode=False, run one encode to warm kernels.
+
+    model_name should be the active model read from the settings collection,
+    so that after a cutover the new model is the one warmed. It becomes the
+    default for later calls, including the post-fork warm-up.
+
+    With gunicorn preload_app the master only loads the weights (encode=False)
+    so forked workers share them copy-on-write; each worker then runs its own
+    warm-up encode after fork, since thread pools do not survive fork.
+    No-op when encoding is delegated to a separate embedding worker.
+    """
+    global _warm_pid, _default_model
+    if config.EMBEDDING_SERVICE_ADDRESS:
+        return
+    if model_name:
+        _default_model = model_name
+    start = time.perf_counter()
+    model = get_model()
+    if encode:
+        model.encode(["warm-up"], convert_to_numpy=True, show_progress_bar=False)
+    # Keyed by pid: a preloading master's load does not make forked workers ready
+    _warm_pid = os.getpid()
+    logger.info(f"Embedding model {default_model()} warm-up ({'encode' if encode else 'load'}) "
+                f"took {time.perf_counter() - start:.2f}s")
+
+def is_ready():
+    """True once warm_up ran in this process (loading counts when no encode was asked for)."""
+    return bool(config.EMBEDDING_SERVICE_ADDRESS) or _warm_pid == os.getpid()
+
+def encode_local(texts, batch_size=32, model_name=None):
+    """Encode in this process. Used directly on single-node installs and by the embedding worker."""
+    model = get_model(model_name)
+    embeddings = model.encode(
+        [t[:2000] for t in texts],
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return embeddings.tolist()
+
+def encode_texts(texts, batch_size=32, model_name=None):
+    remote = bool(config.EMBEDDING_SERVICE_ADDRESS)
+    with tracing.span("encode", texts=len(texts), remote=remote, backend=config.EMBEDDING_BACKEND):
+        if not remote:
+            return encode_local(texts, batch_size, model_name)
+        from utils.embedding_client import get_client
+        try:
+            return get_client().encode(texts, model_name)
+        except (OSError, EOFError) as e:
+            if not config.EMBEDDING_LOCAL_FALLBACK:
+                raise
+            logger.warning(f"Embedding worker unavailable ({e}), encoding in-process")
+            return encode_local(texts, batch_size, model_name)
+
+def generate_embedding(text, model_name=None):
     try:
-        model = get_model()
-        embedding = model.encode(text[:2000], convert_to_numpy=True)
-        return embedding.tolist()
+        return encode_texts([text], model_name=model_name)[0]
     except Exception as e:
         raise Exception(f"Failed to generate embedding: {str(e)}")
 
-def generate_embeddings_batch(texts, batch_size=32):
+def generate_embeddings_batch(texts, batch_size=32, model_name=None):
     try:
-        model = get_model()
         logger.info(f"Generating embeddings for {len(texts)} chunks...")
-        embeddings = model.encode(
-            [t[:2000] for t in texts],
-            batch_size=batch_size,
-            convert_to_numpy=True,
-            show_progress_bar=False
-        )
+        embeddings = encode_texts(texts, batch_size, model_name)
         logger.info("Embeddings generated!")
-        return embeddings.tolist()
+        return embeddings
     except Exception as e:
         raise Exception(f"Batch embedding failed: {str(e)}")
 
 def cosine_similarity(vec1, vec2):
+    import numpy as np
     v1 = np.array(vec1)
     v2 = np.array(vec2)
     dot = np.dot(v1, v2)
@@ -0,0 +1,141 @@
+# utils/events.py
+"""Per-user document status events for the /documents/events stream.
+
+Two backends, chosen with DOCUMENT_EVENTS_BACKEND:
+
+memory        Ingestion publishes straight to subscribers in the same
+              process. Only correct with a single worker process (or sticky
+              routing), since the SSE client may be connected elsewhere.
+              The default for `python app.py`.
+changestream  Ingestion writes stage/progress onto the document and every
+              worker tails db.documents with one change stream (needs a
+              replica set; a single-node one is enough locally). The
+              default under gunicorn with more than one worker.
+
+Each stream holds a request thread, so a process serves at most
+DOCUMENT_EVENTS_MAX_STREAMS at once; subscribe returns None past that.
+"""
+import logging
+import os
+import queue
+import threading
+from bson import ObjectId
+from config import config
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = {"status": 1, "stage": 1, "progress": 1, "chunk_count": 1, "error_message": 1,
+                "last_replace": 1, "user_id": 1}
+
+_subscribers = {}
+_streams = 0
+_lock = threading.Lock()
+_watcher = None
+_watcher_pid = None
+
+def to_event(doc):
+    return {
+        "document_id": str(doc["_id"]),
+        "status": doc.get("status"),
+        "stage": doc.get("stage"),
+        "progress": doc.get("progress"),
+        "chunk_count": doc.get("chunk_count", 0),
+        "error_message": doc.get("error_message"),
+        "last_replace": doc.get("last_replace")
+    }
+
+def subscribe(db, user_id):
+    """Register a subscriber queue for user_id's events, or return None if no stream slot is free."""
+    global _streams
+    if config.DOCUMENT_EVENTS_BACKEND == "changestream":
+        _ensure_watcher(db)
+    q = queue.Queue(maxsize=config.DOCUMENT_EVENTS_QUEUE_SIZE)
+    with _lock:
+        if _streams >= config.DOCUMENT_EVENTS_MAX_STREAMS:
+            return None
+        _streams += 1
+        _subscribers.setdefault(str(user_id), set()).add(q)
+    return q
+
+def unsubscribe(user_id, q):
+    global _streams
+    with _lock:
+        queues = _subscribers.get(str(user_id))
+        if queues is not None and q in queues:
+            _streams -= 1
+            queues.discard(q)
+            if not queues:
+                del _subscribers[str(user_id)]
+
+def _deliver(user_id, event):
+    with _lock:
+        queues = list(_subscribers.get(str(user_id), ()))
+    for q in queues:
+        # A stalled client loses the oldest queued events, never the newest, which
+        # may be the terminal ready/error that no later event would replace
+        while True:
+            try:
+                q.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+def publish(db, user_id, document_id, status, stage=None, progress=None, written=False, **fields):
+    """Report a document's stage. `progress` is {"done": n, "total": m} or None.
+
+    With the changestream backend this is a document update that the
+    watchers turn into events (skipped when the caller's own update already
+    wrote these fields, `written=True`); otherwise it is delivered in-process.
+    """
+    if config.DOCUMENT_EVENTS_BACKEND == "changestream":
+        if written:
+            return
+        db.documents.update_one(
+            {"_id": ObjectId(document_id)},
+            {"$set": {"stage": stage, "progress": progress, **fields}}
+        )
+        return
+    _deliver(user_id, {
+        "document_id": str(document_id),
+        "status": status,
+        "stage": stage,
+        "progress": progress,
+        "chunk_count": fields.get("chunk_count", 0),
+        "error_message": fields.get("error_message"),
+        "last_replace": fields.get("last_replace")
+    })
+
+def _ensure_watcher(db):
+    global _watcher, _watcher_pid
+    if _watcher_pid == os.getpid() and _watcher.is_alive():
+        return
+    with _lock:
+        if _watcher_pid != os.getpid() or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch, args=(db,), name="document-events", daemon=True)
+            _watcher.start()
+            _watcher_pid = os.getpid()
+
+def _watch(db):
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    resume_token = None
+    failures = 0
+    while True:
+        try:
+            with db.documents.watch(pipeline, full_document="updateLookup",
+                                    resume_after=resume_token) as stream:
+                for change in stream:
+                    resume_token = stream.resume_token
+                    failures = 0
+                    doc = change.get("fullDocument")
+                    if doc is not None and doc.get("user_id"):
+                        _deliver(doc["user_id"], to_event(doc))
+        except Exception as e:
+            failures += 1
+            logger.error(f"Document change stream failed, restarting: {e}")
+            if failures > 1:
+                # The resume point may have rolled off the oplog; start from now
+                resume_token = None
+            threading.Event().wait(min(30, 2 ** failures))
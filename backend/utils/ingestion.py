@@ -0,0 +1,501 @@
+# utils/ingestion.py
+"""Document ingestion: extract, chunk, embed and store uploaded files.
+
+One run can cover many files. Files are extracted one at a time and their
+chunks queued; every INGEST_EMBED_BATCH queued chunks make one embedding
+call, whatever files they came from. A document is stored and activated as
+soon as its last chunk is embedded, so memory holds about one batch plus
+the documents in flight, and every document keeps its own status, progress
+events and error.
+
+`revise` builds a new revision of an existing document, from an uploaded
+file (`replace`) or from its stored text (utils/rechunk.py): chunks whose
+content hash is unchanged keep their embeddings, only new text is embedded,
+and the new chunk set is swapped in as a whole.
+
+Extracted text is kept in utils/text_store.py so that rechunking never
+parses the file again.
+"""
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from config import config
+from models.document import create_chunk, content_hash
+from utils.chunker import extract_text, chunk_text
+from utils.embeddings import generate_embeddings_batch
+from utils.embedding_versions import get_active_model, model_filter, vector_for
+from utils.stats import stats_op, status_change
+from utils.metrics import timed, CHUNKS_EMBEDDED
+from utils.profiler import ingestion_snapshot
+from utils import tracing, events, text_store
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH = 1000
+# IllegalOperation: transactions need a replica set or mongos
+NO_TRANSACTIONS = 20
+
+def ingestion_item(document_id, file_path, file_type, user_id):
+    return {"document_id": document_id, "file_path": file_path, "file_type": file_type, "user_id": user_id}
+
+def replacement_item(document_id, file_path, file_type, user_id, original_name, file_size, previous_status):
+    """An ingestion_item for a new revision; the metadata is applied when the swap succeeds."""
+    return {
+        **ingestion_item(document_id, file_path, file_type, user_id),
+        "operation": "Replacement",
+        "previous_status": previous_status,
+        "metadata": {
+            "filename": os.path.basename(file_path),
+            "original_name": original_name,
+            "file_type": file_type,
+            "file_size": file_size
+        }
+    }
+
+def rechunk_item(document_id, user_id, previous_status):
+    """A revision rebuilt from the document's stored text, with its metadata unchanged."""
+    return {
+        "document_id": document_id,
+        "user_id": user_id,
+        "operation": "Rechunking",
+        "previous_status": previous_status,
+        "metadata": {}
+    }
+
+def _extract(db, item):
+    logger.info(f"Extracting text from {item['file_path']}")
+    events.publish(db, item["user_id"], item["document_id"], "processing", "extracting")
+    with timed("extract"):
+        text = extract_text(item["file_path"], item["file_type"])
+    if not text:
+        raise Exception("No text could be extracted from document")
+    return text
+
+def _chunk(db, item, text):
+    events.publish(db, item["user_id"], item["document_id"], "processing", "chunking")
+    with timed("chunk"):
+        chunks = chunk_text(text)
+    logger.info(f"Created {len(chunks)} chunks from document {item['document_id']}")
+    if not chunks:
+        raise Exception("Document produced no chunks")
+    return chunks
+
+def _keep_text(db, item, text):
+    # Only rechunking depends on it, so a failure here does not fail ingestion
+    try:
+        text_store.save(db, item["document_id"], item["user_id"], text)
+    except Exception as e:
+        logger.error(f"Could not store extracted text for {item['document_id']}: {e}")
+
+def _extract_and_chunk(db, item):
+    text = _extract(db, item)
+    chunks = _chunk(db, item, text)
+    _keep_text(db, item, text)
+    return chunks
+
+def _embed(db, prepared, embedding_model):
+    """Embed every prepared document's chunks in cross-document batches."""
+    flat = [(i, chunk) for i, (_, chunks) in enumerate(prepared) for chunk in chunks]
+    done = [0] * len(prepared)
+    for item, chunks in prepared:
+        events.publish(db, item["user_id"], item["document_id"], "processing", "embedding",
+                       {"done": 0, "total": len(chunks)})
+
+    vectors = []
+    for start in range(0, len(flat), config.INGEST_EMBED_BATCH):
+        batch = flat[start:start + config.INGEST_EMBED_BATCH]
+        with timed("embed"):
+            vectors.extend(generate_embeddings_batch([c for _, c in batch], model_name=embedding_model))
+        CHUNKS_EMBEDDED.inc(len(batch))
+        for i, count in sorted(Counter(i for i, _ in batch).items()):
+            done[i] += count
+            item, chunks = prepared[i]
+            events.publish(db, item["user_id"], item["document_id"], "processing", "embedding",
+                           {"done": done[i], "total": len(chunks)})
+
+    per_document, offset = [], 0
+    for _, chunks in prepared:
+        per_document.append(vectors[offset:offset + len(chunks)])
+        offset += len(chunks)
+    return per_document
+
+def _live_documents(db, document_ids, session=None):
+    """{document_id: is_active} for those of document_ids that still exist."""
+    return {str(d["_id"]): d.get("is_active", True) for d in db.documents.find(
+        {"_id": {"$in": [ObjectId(d) for d in document_ids]}}, {"is_active": 1}, session=session
+    )}
+
+def _apply_liveness(db, document_ids, live, chunk_filter, session):
+    gone = [d for d in document_ids if d not in live]
+    enabled = [d for d, active in live.items() if active]
+    disabled = [d for d, active in live.items() if not active]
+    if gone:
+        db.document_chunks.delete_many({**chunk_filter, "document_id": {"$in": gone}}, session=session)
+    for ids, active in ((enabled, True), (disabled, False)):
+        if ids:
+            db.document_chunks.update_many(
+                {**chunk_filter, "document_id": {"$in": ids}}, {"$set": {"is_active": active}}, session=session
+            )
+
+def _activate(db, document_ids, chunk_filter=None, session=None):
+    """Switch on new chunks, but only for documents that still exist and are enabled.
+
+    Retrieval reads document_chunks alone, so chunks of a document deleted
+    meanwhile are removed and those of a disabled one stay off. The check is
+    repeated after the write: deletes and admin toggles change the document
+    before its chunks, so either they see these chunks or the re-check sees
+    their change. Returns {document_id: is_active} for surviving documents.
+    """
+    chunk_filter = chunk_filter or {}
+    live = _live_documents(db, document_ids, session)
+    _apply_liveness(db, document_ids, live, chunk_filter, session)
+    rechecked = _live_documents(db, document_ids, session)
+    if rechecked != live:
+        _apply_liveness(db, document_ids, rechecked, chunk_filter, session)
+    return rechecked
+
+def _store(db, prepared, embeddings, embedding_model):
+    """Write and activate chunks; returns (entries whose document survived, {document_id: is_active})."""
+    chunk_docs = []
+    for (item, chunks), vectors in zip(prepared, embeddings):
+        events.publish(db, item["user_id"], item["document_id"], "processing", "storing")
+        for i, (content, embedding) in enumerate(zip(chunks, vectors)):
+            chunk_docs.append(create_chunk(
+                document_id=item["document_id"],
+                user_id=item["user_id"],
+                content=content,
+                chunk_index=i,
+                embedding=embedding,
+                embedding_model=embedding_model
+            ))
+
+    document_ids = [item["document_id"] for item, _ in prepared]
+    with timed("insert"):
+        for start in range(0, len(chunk_docs), INSERT_BATCH):
+            db.document_chunks.insert_many(chunk_docs[start:start + INSERT_BATCH], ordered=False)
+        # Chunks go in inactive and become searchable together
+        live = _activate(db, document_ids)
+
+    gone = [item["document_id"] for item, _ in prepared if item["document_id"] not in live]
+    if gone:
+        logger.info(f"Documents deleted during ingestion: {', '.join(gone)}")
+    stored = [(item, chunks) for item, chunks in prepared if item["document_id"] in live]
+    if not stored:
+        return [], live
+
+    now = datetime.now(timezone.utc)
+    # A document disabled meanwhile keeps the status its toggle gave it
+    db.documents.bulk_write([UpdateOne(
+        {"_id": ObjectId(item["document_id"])},
+        {"$set": {
+            **({"status": "ready"} if live[item["document_id"]] else {}),
+            "stage": "ready",
+            "progress": None,
+            "chunk_count": len(chunks),
+            "updated_at": now
+        }}
+    ) for item, chunks in stored], ordered=False)
+    for item, chunks in stored:
+        status = "ready" if live[item["document_id"]] else "disabled"
+        events.publish(db, item["user_id"], item["document_id"], status, "ready",
+                       written=True, chunk_count=len(chunks))
+    return stored, live
+
+def _mark_failed(db, item, error):
+    logger.error(f"Document processing failed for {item['document_id']}: {error}")
+    db.documents.update_one(
+        {"_id": ObjectId(item["document_id"])},
+        {"$set": {
+            "status": "error",
+            "stage": "error",
+            "progress": None,
+            "error_message": str(error),
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+    events.publish(db, item["user_id"], item["document_id"], "error", "error",
+                   written=True, error_message=str(error))
+
+class _IngestRun:
+    """Chunks queued across documents, embedded in fixed-size batches and flushed per document."""
+
+    def __init__(self, db):
+        self.db = db
+        self.embedding_model = None
+        self.queue = []  # (entry, chunk) in arrival order; entry = {"item", "chunks", "vectors"}
+        self.ready = 0
+        self.disabled = 0
+        self.failed = 0
+        self.chunks = 0
+
+    def add(self, item, chunks):
+        if self.embedding_model is None:
+            self.embedding_model = get_active_model(self.db)
+        entry = {"item": item, "chunks": chunks, "vectors": []}
+        events.publish(self.db, item["user_id"], item["document_id"], "processing", "embedding",
+                       {"done": 0, "total": len(chunks)})
+        self.queue.extend((entry, chunk) for chunk in chunks)
+        while len(self.queue) >= config.INGEST_EMBED_BATCH:
+            self.embed_next()
+
+    def finish(self):
+        while self.queue:
+            self.embed_next()
+
+    def fail(self, entries, error):
+        ids = {entry["item"]["document_id"] for entry in entries}
+        self.queue = [(entry, chunk) for entry, chunk in self.queue if entry["item"]["document_id"] not in ids]
+        for entry in entries:
+            _mark_failed(self.db, entry["item"], error)
+        self.failed += len(entries)
+
+    def embed_next(self):
+        batch = self.queue[:config.INGEST_EMBED_BATCH]
+        del self.queue[:config.INGEST_EMBED_BATCH]
+        entries = list({entry["item"]["document_id"]: entry for entry, _ in batch}.values())
+        try:
+            self.embed(batch)
+        except Exception as e:
+            if len(entries) == 1:
+                self.fail(entries, e)
+                return
+            # Retry document by document so only the one at fault fails
+            failed = set()
+            for entry in entries:
+                try:
+                    self.embed([(owner, chunk) for owner, chunk in batch if owner is entry])
+                except Exception as error:
+                    self.fail([entry], error)
+                    failed.add(entry["item"]["document_id"])
+            entries = [entry for entry in entries if entry["item"]["document_id"] not in failed]
+        for entry in entries:
+            item = entry["item"]
+            events.publish(self.db, item["user_id"], item["document_id"], "processing", "embedding",
+                           {"done": len(entry["vectors"]), "total": len(entry["chunks"])})
+        complete = [entry for entry in entries if len(entry["vectors"]) == len(entry["chunks"])]
+        if complete:
+            self.store(complete)
+
+    def embed(self, batch):
+        with timed("embed"):
+            vectors = generate_embeddings_batch([chunk for _, chunk in batch], model_name=self.embedding_model)
+        CHUNKS_EMBEDDED.inc(len(batch))
+        for (entry, _), vector in zip(batch, vectors):
+            entry["vectors"].append(vector)
+
+    def store(self, entries):
+        try:
+            stored, live = _store(self.db, [(e["item"], e["chunks"]) for e in entries],
+                                  [e["vectors"] for e in entries], self.embedding_model)
+        except Exception as e:
+            self.db.document_chunks.delete_many(
+                {"document_id": {"$in": [entry["item"]["document_id"] for entry in entries]}}
+            )
+            self.fail(entries, e)
+            return
+        for item, chunks in stored:
+            if live[item["document_id"]]:
+                self.ready += 1
+            else:
+                self.disabled += 1
+            self.chunks += len(chunks)
+
+def ingest(app, items):
+    """Process uploaded files (see ingestion_item) in a background thread."""
+    label = items[0]["document_id"] if len(items) == 1 else f"batch of {len(items)}"
+    with app.app_context(), \
+            tracing.span("ingest_document", root=True, documents=len(items), document_id=label) as trace, \
+            ingestion_snapshot(label):
+        db = app.db
+        run = _IngestRun(db)
+        try:
+            for item in items:
+                try:
+                    run.add(item, _extract_and_chunk(db, item))
+                except Exception as e:
+                    _mark_failed(db, item, e)
+                    run.failed += 1
+                finally:
+                    _remove_file(item)
+            run.finish()
+        finally:
+            # Deletes and toggles that raced ingestion already counted their own status change
+            increments = {"documents.total_chunks": run.chunks}
+            for status, count in (("ready", run.ready), ("error", run.failed)):
+                for key, value in status_change("processing", status).items():
+                    increments[key] = increments.get(key, 0) + value * count
+            app.write_behind.submit([stats_op(increments)])
+            for item in items:
+                _remove_file(item)
+
+        trace.set_attribute("chunks", run.chunks)
+        if run.failed:
+            trace.set_attribute("error", f"{run.failed} of {len(items)} documents failed")
+        logger.info(f"Ingested {run.ready + run.disabled} documents ({run.chunks} chunks), {run.failed} failed")
+
+def _remove_file(item):
+    try:
+        if os.path.exists(item["file_path"]):
+            os.remove(item["file_path"])
+    except OSError:
+        pass
+
+def _reusable_embeddings(db, document_id, embedding_model):
+    """content_hash -> vector for the document's current chunks that have one for embedding_model."""
+    vectors = {}
+    for chunk in db.document_chunks.find(
+        {"document_id": document_id, **model_filter(embedding_model)},
+        {"content": 1, "content_hash": 1, "embedding": 1, "embedding_model": 1,
+         "embedding_shadow": 1, "embedding_shadow_model": 1}
+    ):
+        vector = vector_for(chunk, embedding_model)
+        if vector:
+            # Chunks stored before hashing was added are hashed here
+            vectors.setdefault(chunk.get("content_hash") or content_hash(chunk["content"]), vector)
+    return vectors
+
+def _swap(db, item, revision, chunks, embeddings, embedding_model, report):
+    """Insert the new revision's chunks, then activate them and drop the old ones together.
+
+    With a replica set this is one transaction. On a standalone server the
+    new chunks are activated before the old ones are deleted, so retrieval
+    may briefly see both revisions but never a partial one.
+    Returns (status, previous chunk count), or None if the document was deleted meanwhile.
+    """
+    document_id = item["document_id"]
+    chunk_docs = [create_chunk(
+        document_id=document_id,
+        user_id=item["user_id"],
+        content=content,
+        chunk_index=i,
+        embedding=embedding,
+        embedding_model=embedding_model,
+        revision=revision
+    ) for i, (content, embedding) in enumerate(zip(chunks, embeddings))]
+    with timed("insert"):
+        for start in range(0, len(chunk_docs), INSERT_BATCH):
+            db.document_chunks.insert_many(chunk_docs[start:start + INSERT_BATCH], ordered=False)
+
+    new_chunks = {"document_id": document_id, "revision": revision}
+    old_chunks = {"document_id": document_id, "revision": {"$ne": revision}}
+    old_count = db.document_chunks.count_documents(old_chunks)
+    report["removed"] = old_count
+
+    def apply(session=None):
+        live = _activate(db, [document_id], new_chunks, session)
+        if document_id not in live:
+            return None
+        status = "ready" if live[document_id] else "disabled"
+        db.document_chunks.delete_many(old_chunks, session=session)
+        db.documents.update_one({"_id": ObjectId(document_id)}, {"$set": {
+            **item["metadata"],
+            "status": status,
+            "stage": "ready",
+            "progress": None,
+            "chunk_count": len(chunks),
+            "error_message": None,
+            "last_replace": report,
+            "updated_at": datetime.now(timezone.utc)
+        }}, session=session)
+        return status
+
+    with timed("swap"):
+        try:
+            with db.client.start_session() as session:
+                status = session.with_transaction(apply)
+        except OperationFailure as e:
+            if e.code != NO_TRANSACTIONS:
+                raise
+            status = apply()
+    return (status, old_count) if status else None
+
+def _mark_revision_failed(db, item, error):
+    """The previous revision is untouched, so the document goes back to its old status."""
+    logger.error(f"{item['operation']} of document {item['document_id']} failed: {error}")
+    message = f"{item['operation']} failed: {error}"
+    db.documents.update_one(
+        {"_id": ObjectId(item["document_id"])},
+        {"$set": {
+            "status": item["previous_status"],
+            "stage": item["previous_status"],
+            "progress": None,
+            "error_message": message,
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+    events.publish(db, item["user_id"], item["document_id"], item["previous_status"], item["previous_status"],
+                   written=True, error_message=message)
+
+def revise(app, item, text=None):
+    """Swap in a new revision of item's document, re-embedding only changed chunks.
+
+    text defaults to what item's file extracts to. Returns the reuse report,
+    or None if the document was deleted meanwhile. On failure the previous
+    revision stays live and the error is re-raised. Needs an app context.
+    """
+    db = app.db
+    document_id = item["document_id"]
+    revision = str(ObjectId())
+    try:
+        if text is None:
+            text = _extract(db, item)
+        chunks = _chunk(db, item, text)
+        embedding_model = get_active_model(db)
+        reusable = _reusable_embeddings(db, document_id, embedding_model)
+        hashes = [content_hash(c) for c in chunks]
+        # Each distinct new text is embedded once
+        missing = {h: c for h, c in zip(hashes, chunks) if h not in reusable}
+        logger.info(f"Revising document {document_id}: {len(chunks) - len(missing)} of "
+                    f"{len(chunks)} chunks unchanged, embedding {len(missing)}")
+        vectors = _embed(db, [(item, list(missing.values()))], embedding_model)[0]
+        reusable.update(zip(missing, vectors))
+
+        report = {
+            "reused": sum(1 for h in hashes if h not in missing),
+            "recomputed": len(missing),
+            "at": datetime.now(timezone.utc).isoformat()
+        }
+        events.publish(db, item["user_id"], document_id, "processing", "storing")
+        swapped = _swap(db, item, revision, chunks, [reusable[h] for h in hashes], embedding_model, report)
+    except Exception as e:
+        # Whatever of the new revision was written is dropped; the old one stays live
+        db.document_chunks.delete_many({"document_id": document_id, "revision": revision})
+        _mark_revision_failed(db, item, e)
+        app.write_behind.submit([stats_op(status_change("processing", item["previous_status"]))])
+        raise
+
+    if swapped is None:
+        logger.info(f"Document {document_id} was deleted during revision")
+        return None
+    status, old_count = swapped
+    if "file_path" in item:
+        _keep_text(db, item, text)
+    events.publish(db, item["user_id"], document_id, status, "ready", written=True,
+                   chunk_count=len(chunks), last_replace=report)
+    app.write_behind.submit([stats_op({
+        "documents.total_chunks": len(chunks) - old_count,
+        **status_change("processing", status)
+    })])
+    logger.info(f"Revised document {document_id}: {report['reused']} chunks reused, "
+                f"{report['recomputed']} embedded, {old_count} previous chunks removed")
+    return report
+
+def replace(app, item):
+    """Ingest a new revision uploaded as a file (see replacement_item) in a background thread."""
+    document_id = item["document_id"]
+    with app.app_context(), \
+            tracing.span("replace_document", root=True, document_id=document_id) as trace, \
+            ingestion_snapshot(document_id):
+        try:
+            report = revise(app, item)
+            if report:
+                trace.set_attribute("chunks_reused", report["reused"])
+                trace.set_attribute("chunks_embedded", report["recomputed"])
+        except Exception as e:
+            trace.set_attribute("error", str(e))
+        finally:
+            _remove_file(item)
@@ -0,0 +1,121 @@
+# utils/jobs.py
+"""Single-slot background jobs recorded in the settings collection.
+
+The re-embed and rechunk jobs each own one settings document whose `job`
+field says what is running. Claiming a job writes an owner id and a
+heartbeat; the owning process refreshes the heartbeat every
+JOB_HEARTBEAT_INTERVAL seconds while the job runs. A running or cancelling
+job whose heartbeat is older than JOB_LEASE_SECONDS belongs to a process
+that died, so a new job may take the slot over and a cancel finishes it
+directly. Job writes are filtered on the owner, so a stalled process that
+wakes up after a takeover cannot clobber its successor.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+from config import config
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ["running", "cancelling"]
+
+def _stale_before():
+    return datetime.now(timezone.utc) - timedelta(seconds=config.JOB_LEASE_SECONDS)
+
+def _stale():
+    return {"$or": [{"job.heartbeat_at": {"$lt": _stale_before()}}, {"job.heartbeat_at": None}]}
+
+def claim(db, settings_id, job, extra=None):
+    """Record `job` as running unless a live job holds the slot.
+
+    extra: other settings fields to set with the claim. Returns a Lease, or
+    None if the slot is taken.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    now = datetime.now(timezone.utc)
+    try:
+        previous = db.settings.find_one_and_update(
+            {"_id": settings_id, "$or": [{"job.status": {"$nin": ACTIVE}}, *_stale()["$or"]]},
+            {"$set": {**(extra or {}), "job": {**job, "owner": owner, "heartbeat_at": now}}},
+            {"job.status": 1, "job.owner": 1},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return None
+    previous_job = (previous or {}).get("job") or {}
+    if previous_job.get("status") in ACTIVE:
+        logger.warning(f"Taking over {settings_id} job from {previous_job.get('owner')}, whose lease expired")
+    return Lease(db, settings_id, owner)
+
+def cancel(db, settings_id, extra=None):
+    """Ask the running job to stop. Returns False if no job is running.
+
+    A job whose owner died is marked cancelled right away (with `extra`
+    settings fields), since nothing is left to notice the request.
+    """
+    result = db.settings.update_one(
+        {"_id": settings_id, "job.status": "running", "job.heartbeat_at": {"$gte": _stale_before()}},
+        {"$set": {"job.status": "cancelling"}}
+    )
+    if result.modified_count:
+        return True
+    result = db.settings.update_one(
+        {"_id": settings_id, "job.status": {"$in": ACTIVE}, **_stale()},
+        {"$set": {**(extra or {}), "job.status": "cancelled", "job.finished_at": datetime.now(timezone.utc)}}
+    )
+    return result.modified_count == 1
+
+class Lease:
+    """Ownership of a claimed job; use as a context manager around the job's work."""
+
+    def __init__(self, db, settings_id, owner):
+        self.db = db
+        self.settings_id = settings_id
+        self.owner = owner
+        self.lost = False
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        threading.Thread(target=self._beat, name=f"{self.settings_id}-heartbeat", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        return False
+
+    def _beat(self):
+        while not self._stop.wait(config.JOB_HEARTBEAT_INTERVAL):
+            try:
+                result = self.db.settings.update_one(
+                    self.filter(), {"$set": {"job.heartbeat_at": datetime.now(timezone.utc)}}
+                )
+            except Exception as e:
+                logger.warning(f"{self.settings_id} job heartbeat failed: {e}")
+                continue
+            if result.matched_count == 0:
+                logger.warning(f"{self.settings_id} job was taken over by another process")
+                self.lost = True
+                return
+
+    def filter(self):
+        return {"_id": self.settings_id, "job.owner": self.owner}
+
+    def update(self, update):
+        return self.db.settings.update_one(self.filter(), update)
+
+    def set(self, **fields):
+        return self.update({"$set": {f"job.{k}": v for k, v in fields.items()}})
+
+    def stopping(self):
+        """True once the job was cancelled or lost to another process."""
+        if self.lost:
+            return True
+        state = self.db.settings.find_one(self.filter(), {"job.status": 1})
+        if state is None:
+            self.lost = True
+            return True
+        return state.get("job", {}).get("status") == "cancelling"
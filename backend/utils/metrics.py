@@ -0,0 +1,66 @@
+# utils/metrics.py
+"""Prometheus metrics and stage timers.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory;
+every worker then writes its samples there and /metrics aggregates them.
+"""
+import os
+import time
+from contextlib import ContextDecorator
+from utils import tracing
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+)
+
+STAGE_SECONDS = Histogram(
+    "ka_stage_seconds", "Time spent per RAG / ingestion stage", ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REQUEST_SECONDS = Histogram(
+    "ka_request_seconds", "HTTP request latency", ["endpoint", "method", "status"]
+)
+CHUNKS_SCANNED = Counter("ka_chunks_scanned_total", "Chunks scored during retrieval")
+BYTES_FETCHED = Counter("ka_bytes_fetched_total", "Approximate chunk bytes fetched from MongoDB")
+CHUNKS_EMBEDDED = Counter("ka_chunks_embedded_total", "Chunks embedded during ingestion")
+LLM_TOKENS = Counter("ka_llm_tokens_total", "Tokens reported by the LLM")
+CACHE_EVENTS = Counter("ka_cache_events_total", "Cache lookups", ["cache", "result"])
+
+class timed(ContextDecorator):
+    """Observe the duration of a block or function in ka_stage_seconds{stage=...}.
+
+    Also records a tracing span of the same name when tracing is enabled.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._start = None
+        self._span = None
+
+    def _recreate_cm(self):
+        # A fresh instance per call keeps decorated functions thread-safe
+        return timed(self.stage)
+
+    def __enter__(self):
+        self._span = tracing.span(self.stage)
+        self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.labels(self.stage).observe(time.perf_counter() - self._start)
+        self._span.__exit__(*exc)
+        return False
+
+def cache_event(cache, hit, count=1):
+    if count:
+        CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+def render_metrics():
+    """Return (body, content_type) in the Prometheus text format."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
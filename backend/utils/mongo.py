@@ -0,0 +1,53 @@
+# utils/mongo.py
+import os
+import threading
+import weakref
+from pymongo import MongoClient
+
+_handles = weakref.WeakSet()
+
+class ForkSafeDatabase:
+    """Default database of `uri`, with one MongoClient per process.
+
+    A MongoClient is not fork-safe: with gunicorn preload_app the master
+    builds the app, and workers forked from it must not reuse its sockets
+    or monitor threads. Each process opens its own client on first use, so
+    app.db can be created before the fork. Attribute and item access go to
+    the underlying pymongo Database.
+    """
+
+    def __init__(self, uri, **client_options):
+        self._uri = uri
+        self._client_options = client_options
+        self._lock = threading.Lock()
+        self._client = None
+        self._db = None
+        self._pid = None
+        _handles.add(self)
+
+    def _database(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = MongoClient(self._uri, **self._client_options)
+                    self._db = self._client.get_default_database()
+                    self._pid = os.getpid()
+        return self._db
+
+    def close(self):
+        """Close this process's client; the next access opens a new one."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = self._db = self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(self._database(), name)
+
+    def __getitem__(self, name):
+        return self._database()[name]
+
+def close_all():
+    """Close every handle's client; gunicorn calls this in the master before forking workers."""
+    for handle in list(_handles):
+        handle.close()
@@ -0,0 +1,117 @@
+# utils/onnx_embeddings.py
+# ONNX Runtime backend for sentence embeddings (EMBEDDING_BACKEND=onnx).
+# The model is exported ahead of time from sentence-transformers with
+# `python -m scripts.onnx_export`; serving only needs onnxruntime, tokenizers
+# and numpy, all imported lazily, and never loads torch.
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model_int8.onnx"
+META_FILE = "embedding_config.json"
+
+def export_onnx(model_name, out_dir, quantize=True):
+    """Export a SentenceTransformer's encoder to ONNX (plus an int8 copy)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(out_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model
+    transformer.config.return_dict = False
+    transformer.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(out_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(out_dir, QUANTIZED_FILE), weight_type=QuantType.QInt8)
+
+    meta = {
+        "model": model_name,
+        "max_seq_length": st_model.max_seq_length,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "normalize": any(type(module).__name__ == "Normalize" for module in st_model)
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f)
+    logger.info(f"Exported {model_name} to ONNX at {out_dir}")
+    return meta
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode: tokenize, run, mean-pool, normalize."""
+
+    def __init__(self, model_dir, quantized=False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        path = os.path.join(model_dir, QUANTIZED_FILE if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self):
+        return self.meta["dimension"]
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.meta.get("normalize"):
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(batches) if batches else np.zeros((0, self.meta["dimension"]), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+def load_onnx_encoder(model_name, model_dir, quantized=False):
+    """Load an exported model; raises FileNotFoundError if it was not exported."""
+    required = [META_FILE, QUANTIZED_FILE if quantized else MODEL_FILE]
+    missing = [name for name in required if not os.path.exists(os.path.join(model_dir, name))]
+    if missing:
+        raise FileNotFoundError(
+            f"No ONNX export of {model_name} at {model_dir} (missing {', '.join(missing)}); "
+            f"run `python -m scripts.onnx_export --model {model_name}`"
+            + ("" if quantized else " --no-quantize")
+        )
+    return OnnxEncoder(model_dir, quantized=quantized)
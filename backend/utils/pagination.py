@@ -0,0 +1,80 @@
+# utils/pagination.py
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from bson import ObjectId
+from config import config
+from utils.metrics import cache_event
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def encode_cursor(doc, sort_field):
+    raw = json.dumps([doc[sort_field].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value, oid = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(value), ObjectId(oid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def count_total(collection, query):
+    """Estimated count for unfiltered collections, short-lived cached count otherwise."""
+    if not query:
+        return collection.estimated_document_count()
+    key = (collection.name, repr(sorted(query.items())))
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(key)
+        if entry and entry[0] > now:
+            cache_event("list_total", True)
+            return entry[1]
+    cache_event("list_total", False)
+    total = collection.count_documents(query)
+    with _count_lock:
+        if len(_count_cache) > 10000:
+            _count_cache.clear()
+        _count_cache[key] = (now + config.PAGINATION_COUNT_TTL, total)
+    return total
+
+def paginate(collection, query, sort_field, args, default_limit=20, projection=None):
+    """Newest-first keyset pagination over (sort_field, _id).
+
+    Clients pass the opaque `cursor` from the previous response. The legacy
+    `page` parameter still works (skip-based) and keeps returning `total`;
+    keyset callers get a total only with `with_total=1`.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(int(args.get('limit', default_limit)), config.PAGINATION_MAX_LIMIT))
+    cursor = args.get('cursor')
+    legacy_page = args.get('page') if not cursor else None
+
+    filter_ = query
+    if cursor:
+        value, oid = decode_cursor(cursor)
+        filter_ = {"$and": [query, {"$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": oid}}
+        ]}]}
+
+    find = collection.find(filter_, projection, sort=[(sort_field, -1), ("_id", -1)])
+    if legacy_page:
+        find = find.skip((int(legacy_page) - 1) * limit)
+    items = list(find.limit(limit + 1))
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    meta = {
+        "limit": limit,
+        "next_cursor": encode_cursor(items[-1], sort_field) if has_more else None
+    }
+    if legacy_page:
+        meta["page"] = int(legacy_page)
+    if legacy_page or args.get('with_total') in ('1', 'true'):
+        meta["total"] = count_total(collection, query)
+    return items, meta
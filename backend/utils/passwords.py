@@ -0,0 +1,171 @@
+# utils/passwords.py
+"""bcrypt hashing off the request threads, plus a login attempt limiter.
+
+Hashes run in a small per-worker process pool so a login storm burns those
+processes' CPU instead of the GIL shared with /chat/ask. At most
+PASSWORD_MAX_PENDING hashes may be queued or running per worker; beyond
+that callers get PasswordServiceBusy immediately (surface as 503).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class PasswordServiceBusy(Exception):
+    """Raised when the hashing queue is full or a hash timed out."""
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_pid = None
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def _ensure_pool():
+    global _executor, _slots, _pid
+    if _pid == os.getpid():
+        return _executor, _slots
+    with _lock:
+        if _pid != os.getpid():
+            # spawn, not fork: the parent is a threaded web worker
+            _executor = ProcessPoolExecutor(
+                max_workers=config.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            ) if config.PASSWORD_HASH_WORKERS > 0 else None
+            _slots = threading.BoundedSemaphore(config.PASSWORD_MAX_PENDING)
+            _pid = os.getpid()
+    return _executor, _slots
+
+def _reset_pool(broken):
+    global _executor
+    with _lock:
+        if _executor is broken:
+            _executor = ProcessPoolExecutor(
+                max_workers=config.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+def _submit(fn, *args):
+    """Run fn in the pool; returns a Future. Raises PasswordServiceBusy when saturated."""
+    executor, slots = _ensure_pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordServiceBusy("Password hashing queue is full")
+    try:
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                _reset_pool(executor)
+                future = _ensure_pool()[0].submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def _run(fn, *args):
+    future = _submit(fn, *args)
+    try:
+        return future.result(timeout=config.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise PasswordServiceBusy("Password hashing timed out")
+    except BrokenProcessPool:
+        _reset_pool(_executor)
+        raise PasswordServiceBusy("Password hashing pool restarted")
+
+def hash_password(password):
+    return _run(_hashpw, password.encode("utf-8"), config.BCRYPT_ROUNDS)
+
+def verify_password(password, hashed):
+    return _run(_checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+def hash_cost(hashed):
+    # $2b$12$<salt+hash>
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed):
+    return hash_cost(hashed) != config.BCRYPT_ROUNDS
+
+def rehash_in_background(password, on_done):
+    """Hash with the configured cost and call on_done(new_hash); skipped when busy."""
+    try:
+        future = _submit(_hashpw, password.encode("utf-8"), config.BCRYPT_ROUNDS)
+    except PasswordServiceBusy:
+        return False
+
+    def done(f):
+        if f.exception() is None:
+            try:
+                on_done(f.result())
+            except Exception as e:
+                logger.error(f"Password rehash write failed: {e}")
+    future.add_done_callback(done)
+    return True
+
+class AttemptLimiter:
+    """Sliding-window failure counter per key, checked before any hashing.
+
+    Per worker process, so the effective limit is multiplied by the number of
+    gunicorn workers; it exists to keep bcrypt off the CPU, not as a lockout.
+    """
+
+    def __init__(self, max_attempts, window):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._attempts = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _trim(self, attempts, now):
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+
+    def retry_after(self, key):
+        """Seconds until key may try again, or 0 if it is not limited."""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if not attempts:
+                return 0
+            self._trim(attempts, now)
+            if len(attempts) < self.max_attempts:
+                if not attempts:
+                    del self._attempts[key]
+                return 0
+            return int(attempts[0] + self.window - now) + 1
+
+    def record(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._attempts) > 100000:
+                self._attempts.clear()
+            attempts = self._attempts[key]
+            self._trim(attempts, now)
+            attempts.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+email_limiter = AttemptLimiter(config.LOGIN_MAX_ATTEMPTS, config.LOGIN_ATTEMPT_WINDOW)
+ip_limiter = AttemptLimiter(config.LOGIN_IP_MAX_ATTEMPTS, config.LOGIN_ATTEMPT_WINDOW)
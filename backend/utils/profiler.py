@@ -0,0 +1,214 @@
+# utils/profiler.py
+"""On-demand CPU sampling and tracemalloc profiling for a live worker.
+
+State is per process: under gunicorn each worker profiles itself, and every
+response carries the worker pid so results can be matched to the worker
+that produced them. While idle the only cost is a boolean check per request
+and a `tracemalloc.is_tracing()` check per ingested document.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+MAX_SECONDS = 300
+MAX_STACK_DEPTH = 64
+# tracemalloc keeps this many frames per live allocation
+MAX_MEMORY_FRAMES = 50
+
+class SamplingProfiler:
+    """Samples every thread's stack via sys._current_frames at a fixed interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.active = False
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests_seen = 0
+        self.max_requests = None
+        self.deadline = None
+        self.interval = 0.01
+        self.started_at = None
+        self.stopped_at = None
+
+    def start(self, seconds=None, requests=None, interval_ms=10):
+        with self._lock:
+            if self.active:
+                return False
+            if not seconds and not requests:
+                seconds = 30
+            seconds = min(float(seconds), MAX_SECONDS) if seconds else MAX_SECONDS
+            self.stacks = Counter()
+            self.samples = 0
+            self.requests_seen = 0
+            self.max_requests = int(requests) if requests else None
+            self.interval = max(1, int(interval_ms)) / 1000
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.deadline = time.monotonic() + seconds
+            self._stop.clear()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="cpu-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def note_request(self):
+        # Called from after_request; a plain attribute read while idle
+        if not self.active or self.max_requests is None:
+            return
+        with self._lock:
+            self.requests_seen += 1
+            if self.requests_seen >= self.max_requests:
+                self._stop.set()
+
+    def _run(self):
+        own = threading.get_ident()
+        try:
+            while not self._stop.wait(self.interval):
+                if time.monotonic() >= self.deadline:
+                    break
+                frames = sys._current_frames()
+                batch = Counter()
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    batch[_collapse(frame)] += 1
+                with self._lock:
+                    self.stacks.update(batch)
+                    self.samples += 1
+        except Exception as e:
+            logger.error(f"CPU profiler stopped: {e}")
+        finally:
+            with self._lock:
+                self.active = False
+                self.stopped_at = time.time()
+
+    def status(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "active": self.active,
+                "samples": self.samples,
+                "interval_ms": self.interval * 1000,
+                "requests_seen": self.requests_seen,
+                "max_requests": self.max_requests,
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+                "distinct_stacks": len(self.stacks)
+            }
+
+    def collapsed(self):
+        """Brendan Gregg's folded format, accepted by flamegraph.pl and speedscope."""
+        with self._lock:
+            items = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def top(self, limit=20):
+        """Functions ranked by self samples (leaf frame)."""
+        leaves = Counter()
+        with self._lock:
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": frame, "samples": count} for frame, count in leaves.most_common(limit)]
+
+def _collapse(frame):
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+cpu_profiler = SamplingProfiler()
+
+# --- Memory ---
+
+_memory_lock = threading.Lock()
+_baseline = None
+_ingestions = deque(maxlen=10)
+
+def start_memory(frames=10):
+    global _baseline
+    with _memory_lock:
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(max(1, min(int(frames), MAX_MEMORY_FRAMES)))
+        _baseline = tracemalloc.take_snapshot()
+        _ingestions.clear()
+        return True
+
+def stop_memory():
+    global _baseline
+    with _memory_lock:
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+        _baseline = None
+        return True
+
+def _filtered(snapshot):
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+def _format_stats(stats, limit):
+    return [{
+        "site": str(stat.traceback[0]) if stat.traceback else "?",
+        "size_kb": round(stat.size_diff / 1024, 1),
+        "count": stat.count_diff,
+        "total_kb": round(stat.size / 1024, 1)
+    } for stat in stats[:limit]]
+
+def memory_report(limit=20, key_type="lineno"):
+    """Top allocation sites since start_memory, plus recent per-document diffs."""
+    with _memory_lock:
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        stats = snapshot.compare_to(_filtered(_baseline), key_type)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": _format_stats(stats, limit),
+            "ingestions": list(_ingestions)
+        }
+
+class ingestion_snapshot:
+    """Record the allocation diff of one ingestion while tracemalloc is on."""
+
+    def __init__(self, document_id, limit=15):
+        self.document_id = document_id
+        self.limit = limit
+        self._before = None
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            self._before = _filtered(tracemalloc.take_snapshot())
+        return self
+
+    def __exit__(self, *exc):
+        if self._before is None or not tracemalloc.is_tracing():
+            return False
+        stats = _filtered(tracemalloc.take_snapshot()).compare_to(self._before, "lineno")
+        _ingestions.append({
+            "document_id": self.document_id,
+            "at": time.time(),
+            "top": _format_stats(stats, self.limit)
+        })
+        return False
@@ -1,58 +1,93 @@
 # utils/rag.py
 import logging
-from groq import Groq
+import hashlib
+import json
+from bson import ObjectId
 from config import config
 from utils.embeddings import generate_embedding, find_similar_chunks
+from utils.embedding_versions import get_active_model, model_filter, vector_for
+from utils.singleflight import SingleFlight
+from utils.metrics import timed, cache_event, CHUNKS_SCANNED, BYTES_FETCHED, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
 _client = None
 
+# Identical questions in flight at the same time share one retrieval/LLM call
+_retrieval_flight = SingleFlight()
+_answer_flight = SingleFlight()
+
 def get_groq_client():
     global _client
     if _client is None:
-        _client = Groq(api_key=config.GROQ_API_KEY)
+        from groq import Groq
+        _client = Groq(api_key=config.GROQ_API_KEY, base_url=config.GROQ_BASE_URL or None)
     return _client
 
-def retrieve_relevant_chunks(db, query, user_id=None, top_k=5):
-    query_embedding = generate_embedding(query)
-
-    doc_filter = {"is_active": True, "status": "ready"}
-    if user_id:
-        doc_filter["$or"] = [
-            {"user_id": user_id},
-            {"user_id": str(user_id)}
-        ]
-
-    active_docs = list(db.documents.find(doc_filter, {"_id": 1}))
-    active_doc_ids = [str(doc["_id"]) for doc in active_docs]
+def normalize_question(question):
+    return " ".join(question.lower().split())
 
-    logger.info(f"Found {len(active_doc_ids)} active docs for user {user_id}")
-
-    if not active_doc_ids:
-        return []
-
-    chunk_filter = {
-        "document_id": {"$in": active_doc_ids},
-        "embedding": {"$exists": True, "$ne": None}
-    }
+def _history_hash(chat_history):
+    turns = [(m["role"], m["content"]) for m in (chat_history or [])[-4:]]
+    return hashlib.sha1(json.dumps(turns).encode("utf-8")).hexdigest()
 
-    chunks = list(db.document_chunks.find(chunk_filter))
-    logger.info(f"Found {len(chunks)} chunks to search through")
+def retrieve_relevant_chunks(db, query, user_id=None, top_k=5):
+    key = (str(user_id) if user_id else None, normalize_question(query), top_k)
+    chunks, shared = _retrieval_flight.do(key, _retrieve_relevant_chunks, db, query, user_id, top_k)
+    cache_event("retrieval_singleflight", shared)
+    if shared:
+        logger.info(f"Coalesced retrieval for user {user_id}")
+    return list(chunks)
+
+def _retrieve_relevant_chunks(db, query, user_id=None, top_k=5):
+    active_model = get_active_model(db)
+    with timed("embed_query"):
+        query_embedding = generate_embedding(query, model_name=active_model)
+
+    # Chunks carry their owner and active flag, so candidates come from one indexed query;
+    # only vectors produced by the active model are scored
+    chunk_filter = {"is_active": True, **model_filter(active_model)}
+    if user_id:
+        chunk_filter["user_id"] = str(user_id)
+
+    with timed("chunk_fetch"):
+        chunks = list(db.document_chunks.find(
+            chunk_filter,
+            {
+                "document_id": 1, "content": 1, "chunk_index": 1,
+                "embedding": 1, "embedding_model": 1,
+                "embedding_shadow": 1, "embedding_shadow_model": 1
+            }
+        ))
+    logger.info(f"Found {len(chunks)} chunks to search through for user {user_id}")
 
     if not chunks:
         return []
 
-    similar = find_similar_chunks(query_embedding, chunks, top_k=top_k)
+    fetched = 0
+    for chunk in chunks:
+        chunk["embedding"] = vector_for(chunk, active_model)
+        # content plus 8 bytes per BSON double
+        fetched += len(chunk["content"]) + 8 * len(chunk["embedding"] or ())
+    CHUNKS_SCANNED.inc(len(chunks))
+    BYTES_FETCHED.inc(fetched)
+
+    with timed("scoring"):
+        similar = find_similar_chunks(query_embedding, chunks, top_k=top_k)
+
+    with timed("document_names"):
+        doc_ids = list({ObjectId(chunk["document_id"]) for _, chunk in similar})
+        names = {
+            str(doc["_id"]): doc["original_name"]
+            for doc in db.documents.find({"_id": {"$in": doc_ids}}, {"original_name": 1})
+        }
 
     results = []
     for score, chunk in similar:
-        from bson import ObjectId
-        doc = db.documents.find_one({"_id": ObjectId(chunk["document_id"])})
         results.append({
             "chunk_id": str(chunk["_id"]),
             "document_id": chunk["document_id"],
-            "document_name": doc["original_name"] if doc else "Unknown",
+            "document_name": names.get(chunk["document_id"], "Unknown"),
             "content": chunk["content"],
             "chunk_index": chunk.get("chunk_index", 0),
             "similarity_score": round(score, 4)
@@ -60,6 +95,27 @@ def retrieve_relevant_chunks(db, query, user_id=None, top_k=5):
     return results
 
 def generate_answer(question, context_chunks, chat_history=None):
+    key = (
+        normalize_question(question),
+        tuple(c["chunk_id"] for c in context_chunks),
+        _history_hash(chat_history)
+    )
+    result, shared = _answer_flight.do(key, _generate_answer, question, context_chunks, chat_history)
+    cache_event("answer_singleflight", shared)
+    result = dict(result)
+    if shared:
+        # Tokens were spent once, by the request that made the LLM call
+        result["tokens_used"] = 0
+        result["coalesced"] = True
+    return result
+
+def coalescing_stats():
+    return {
+        "retrieval": _retrieval_flight.stats(),
+        "generation": _answer_flight.stats()
+    }
+
+def _generate_answer(question, context_chunks, chat_history=None):
     if not context_chunks:
         return {
             "answer": "I couldn't find any relevant documents. Please upload documents first.",
@@ -92,14 +148,16 @@ Rules:
 
     try:
         client = get_groq_client()
-        response = client.chat.completions.create(
-            model=config.GROQ_MODEL,
-            messages=messages,
-            max_tokens=config.MAX_TOKENS,
-            temperature=0.3
-        )
+        with timed("llm"):
+            response = client.chat.completions.create(
+                model=config.GROQ_MODEL,
+                messages=messages,
+                max_tokens=config.MAX_TOKENS,
+                temperature=0.3
+            )
         answer = response.choices[0].message.content
         tokens_used = response.usage.total_tokens
+        LLM_TOKENS.inc(tokens_used)
 
     except Exception as e:
         logger.error(f"Groq error: {e}")
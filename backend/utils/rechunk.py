@@ -0,0 +1,159 @@
+# utils/rechunk.py
+"""Admin job: rebuild chunks and embeddings of chosen documents from stored text.
+
+Used after changing CHUNK_SIZE / CHUNK_OVERLAP / CHUNK_STRATEGY or the
+chunker itself. Text comes from utils/text_store.py, so no file is parsed
+again, and each document goes through the same revision swap as a
+replacement upload (utils/ingestion.revise): chunks that come out the same
+keep their embeddings. Documents run RECHUNK_WORKERS at a time with a
+RECHUNK_PAUSE_MS pause after each, so ingestion and queries keep up.
+
+Job state lives in the settings collection under an expiring lease, like
+the re-embed job (utils/jobs.py).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config import config
+from utils.ingestion import revise, rechunk_item
+from utils.stats import stats_op, status_change
+from utils import events, jobs, text_store
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_ID = "rechunk"
+MAX_ERRORS = 20
+# Each worker thread embeds and swaps one document at a time
+MAX_WORKERS = 16
+
+def get_state(db):
+    job = (db.settings.find_one({"_id": SETTINGS_ID}) or {}).get("job") or {}
+    return {
+        "status": job.get("status", "idle"),
+        "processed": job.get("processed", 0),
+        "total": job.get("total", 0),
+        "skipped": job.get("skipped", 0),
+        "failed": job.get("failed", 0),
+        "chunks_reused": job.get("chunks_reused", 0),
+        "chunks_embedded": job.get("chunks_embedded", 0),
+        "errors": job.get("errors", []),
+        "error": job.get("error"),
+        "owner": job.get("owner"),
+        "heartbeat_at": job["heartbeat_at"].isoformat() if job.get("heartbeat_at") else None,
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None
+    }
+
+def start_rechunk(app, document_ids, workers=None, pause_ms=None):
+    """Claim the job slot and rechunk document_ids in a background thread.
+
+    Returns False if a live job is already running (see utils/jobs.py).
+    """
+    workers = workers or config.RECHUNK_WORKERS
+    pause = (pause_ms if pause_ms is not None else config.RECHUNK_PAUSE_MS) / 1000
+    lease = jobs.claim(app.db, SETTINGS_ID, {
+        "status": "running",
+        "processed": 0,
+        "total": len(document_ids),
+        "skipped": 0,
+        "failed": 0,
+        "chunks_reused": 0,
+        "chunks_embedded": 0,
+        "errors": [],
+        "error": None,
+        "started_at": datetime.now(timezone.utc),
+        "finished_at": None
+    })
+    if lease is None:
+        return False
+
+    thread = threading.Thread(
+        target=run_rechunk,
+        args=(app, lease, document_ids, workers, pause),
+        daemon=True
+    )
+    thread.start()
+    return True
+
+def cancel_rechunk(db):
+    return jobs.cancel(db, SETTINGS_ID)
+
+def _record(lease, increments, error=None):
+    update = {"$inc": {f"job.{k}": v for k, v in increments.items()}}
+    if error:
+        update["$push"] = {"job.errors": {"$each": [error], "$slice": -MAX_ERRORS}}
+    lease.update(update)
+
+def _rechunk_document(app, document_id):
+    db = app.db
+    text = text_store.load(db, document_id)
+    if text is None:
+        return "skipped", "No stored text; re-upload the document"
+
+    # Same claim as a replacement upload, so the two never overlap
+    previous = db.documents.find_one_and_update(
+        {"_id": ObjectId(document_id), "status": {"$ne": "processing"}},
+        {"$set": {
+            "status": "processing",
+            "stage": "queued",
+            "progress": None,
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        {"user_id": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not previous:
+        return "skipped", "Document is processing or was deleted"
+
+    previous_status = previous.get("status", "ready")
+    app.write_behind.submit([stats_op(status_change(previous_status, "processing"))])
+    events.publish(db, previous["user_id"], document_id, "processing", "queued", written=True)
+    return "done", revise(app, rechunk_item(document_id, previous["user_id"], previous_status), text)
+
+def _run_one(app, lease, document_id, pause):
+    if lease.stopping():
+        return
+    with app.app_context():
+        try:
+            outcome, detail = _rechunk_document(app, document_id)
+        except Exception as e:
+            logger.error(f"Rechunking document {document_id} failed: {e}")
+            _record(lease, {"processed": 1, "failed": 1}, {"document_id": document_id, "error": str(e)})
+            return
+    if outcome == "skipped":
+        _record(lease, {"processed": 1, "skipped": 1}, {"document_id": document_id, "error": detail})
+    else:
+        report = detail or {}
+        _record(lease, {
+            "processed": 1,
+            "chunks_reused": report.get("reused", 0),
+            "chunks_embedded": report.get("recomputed", 0)
+        })
+    time.sleep(pause)
+
+def run_rechunk(app, lease, document_ids, workers, pause):
+    with lease:
+        _run_rechunk(app, lease, document_ids, workers, pause)
+
+def _run_rechunk(app, lease, document_ids, workers, pause):
+    db = app.db
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rechunk") as pool:
+            # list() surfaces any exception a worker did not handle
+            list(pool.map(lambda document_id: _run_one(app, lease, document_id, pause), document_ids))
+        stopped = lease.stopping()
+        if lease.lost:
+            logger.warning("Rechunking stopped: job taken over by another process")
+            return
+        status = "cancelled" if stopped else "completed"
+        lease.set(status=status, finished_at=datetime.now(timezone.utc))
+        state = get_state(db)
+        logger.info(f"Rechunking {status}: {state['processed']} documents, {state['chunks_reused']} chunks reused, "
+                    f"{state['chunks_embedded']} embedded, {state['skipped']} skipped, {state['failed']} failed")
+    except Exception as e:
+        logger.error(f"Rechunking failed: {e}")
+        lease.set(status="error", error=str(e), finished_at=datetime.now(timezone.utc))
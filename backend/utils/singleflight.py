@@ -0,0 +1,54 @@
+# utils/singleflight.py
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still in flight wait on the same future and receive the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._calls = 0
+        self._coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn once per in-flight key. Returns (result, shared)."""
+        with self._lock:
+            self._calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                leader = True
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            calls, coalesced = self._calls, self._coalesced
+        return {
+            "calls": calls,
+            "coalesced": coalesced,
+            "ratio": round(coalesced / calls, 4) if calls else 0.0
+        }
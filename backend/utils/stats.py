@@ -0,0 +1,136 @@
+# utils/stats.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config import config
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "global"
+LOCK_ID = "reconcile_lock"
+DOC_STATUSES = ["ready", "processing", "error", "disabled"]
+RECENT_QUERIES = 10
+
+_reconciler_pid = None
+_reconciler_lock = threading.Lock()
+
+def stats_op(increments, recent_query=None):
+    """Build a write-behind op applying $inc counters to the stats document.
+
+    Keys are dotted paths into the stats document, e.g.
+    {"documents.by_status.ready": 1, "documents.by_status.processing": -1}.
+    """
+    update = {"$inc": increments}
+    if recent_query:
+        update["$push"] = {"recent_queries": {"$each": [recent_query], "$slice": -RECENT_QUERIES}}
+    return ("stats", UpdateOne({"_id": STATS_ID}, update, upsert=True))
+
+def status_change(old_status, new_status):
+    if old_status == new_status:
+        return {}
+    increments = {f"documents.by_status.{new_status}": 1}
+    if old_status in DOC_STATUSES:
+        increments[f"documents.by_status.{old_status}"] = -1
+    return increments
+
+def compute_stats(db):
+    """Full recount; used to seed and reconcile the stats document."""
+    usage = list(db.users.aggregate([
+        {"$group": {
+            "_id": None,
+            "total_tokens": {"$sum": "$total_tokens_used"},
+            "total_queries": {"$sum": "$total_queries"}
+        }}
+    ]))
+    token_data = usage[0] if usage else {}
+
+    recent = list(db.messages.find(
+        {"role": "user"},
+        {"content": 1, "user_id": 1, "created_at": 1},
+        sort=[("created_at", -1)]
+    ).limit(RECENT_QUERIES))
+
+    return {
+        "users": {
+            "total": db.users.count_documents({}),
+            "active": db.users.count_documents({"is_active": True})
+        },
+        "documents": {
+            "total": db.documents.count_documents({}),
+            "by_status": {
+                status: db.documents.count_documents({"status": status})
+                for status in DOC_STATUSES
+            },
+            "total_chunks": db.document_chunks.count_documents({})
+        },
+        "conversations": {
+            "total_sessions": db.chat_sessions.count_documents({}),
+            "total_messages": db.messages.count_documents({})
+        },
+        "usage": {
+            "total_tokens": token_data.get("total_tokens", 0),
+            "total_queries": token_data.get("total_queries", 0)
+        },
+        # Stored oldest-first so $push/$slice keeps the newest entries
+        "recent_queries": [
+            {
+                "content": m["content"][:100],
+                "user_id": m["user_id"],
+                "created_at": m["created_at"]
+            }
+            for m in reversed(recent)
+        ]
+    }
+
+def reconcile_stats(db):
+    stats = compute_stats(db)
+    stats["reconciled_at"] = datetime.now(timezone.utc)
+    db.stats.update_one({"_id": STATS_ID}, {"$set": stats}, upsert=True)
+    logger.info("Admin stats reconciled")
+    return stats
+
+def get_stats_doc(db):
+    stats = db.stats.find_one({"_id": STATS_ID})
+    if not stats or "reconciled_at" not in stats:
+        stats = reconcile_stats(db)
+    return stats
+
+def _acquire_lease(db, seconds):
+    """Only one worker across the deployment reconciles per interval."""
+    now = datetime.now(timezone.utc)
+    try:
+        db.stats.find_one_and_update(
+            {"_id": LOCK_ID, "$or": [{"until": {"$lt": now}}, {"until": {"$exists": False}}]},
+            {"$set": {"until": now + timedelta(seconds=seconds), "owner": os.getpid()}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+def _reconcile_loop(db, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            if _acquire_lease(db, interval * 0.9):
+                reconcile_stats(db)
+        except Exception as e:
+            logger.error(f"Stats reconciliation failed: {e}")
+
+def ensure_reconciler(db):
+    """Start the periodic reconciliation thread once per worker process."""
+    global _reconciler_pid
+    if _reconciler_pid == os.getpid() or config.STATS_RECONCILE_INTERVAL <= 0:
+        return
+    with _reconciler_lock:
+        if _reconciler_pid != os.getpid():
+            threading.Thread(
+                target=_reconcile_loop,
+                args=(db, config.STATS_RECONCILE_INTERVAL),
+                daemon=True
+            ).start()
+            _reconciler_pid = os.getpid()
@@ -0,0 +1,78 @@
+# utils/text_store.py
+"""Extracted document text, kept so documents can be rechunked without re-parsing.
+
+One record per document in `document_texts`, keyed by the document's _id:
+the UTF-8 text compressed with zstd (zlib when the zstandard package is
+not installed), a codec tag, the sha256 of the raw text and both sizes.
+PDF text keeps its "[Page N]" markers, so pages survive the round trip.
+"""
+import hashlib
+import logging
+import zlib
+from datetime import datetime, timezone
+from bson import ObjectId
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_zstd = None
+
+def _zstandard():
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            logger.warning("zstandard is not installed; extracted text is stored with zlib")
+            _zstd = False
+    return _zstd or None
+
+def encode(text):
+    """Record fields for text, without ids; safe to build in extraction workers."""
+    raw = text.encode("utf-8")
+    zstd = _zstandard()
+    if zstd is not None:
+        # Compressors are not thread-safe; one per call is cheap next to extraction
+        codec, data = "zstd", zstd.ZstdCompressor(level=config.TEXT_ZSTD_LEVEL).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, 6)
+    return {
+        "codec": codec,
+        "data": data,
+        "content_hash": hashlib.sha256(raw).hexdigest(),
+        "size": len(raw),
+        "compressed_size": len(data)
+    }
+
+def decode(record):
+    if record["codec"] == "zstd":
+        zstd = _zstandard()
+        if zstd is None:
+            raise Exception("Stored text is zstd-compressed but zstandard is not installed")
+        raw = zstd.ZstdDecompressor().decompress(record["data"], max_output_size=record["size"])
+    else:
+        raw = zlib.decompress(record["data"])
+    if hashlib.sha256(raw).hexdigest() != record["content_hash"]:
+        raise Exception("Stored text does not match its content hash")
+    return raw.decode("utf-8")
+
+def record(document_id, user_id, encoded):
+    return {
+        "_id": ObjectId(document_id),
+        "user_id": str(user_id),
+        **encoded,
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+def save(db, document_id, user_id, text):
+    doc = record(document_id, user_id, encode(text))
+    db.document_texts.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+
+def load(db, document_id):
+    """The document's extracted text, or None if none was stored."""
+    doc = db.document_texts.find_one({"_id": ObjectId(document_id)})
+    return decode(doc) if doc else None
+
+def delete(db, document_ids):
+    db.document_texts.delete_many({"_id": {"$in": [ObjectId(d) for d in document_ids]}})
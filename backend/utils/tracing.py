@@ -0,0 +1,152 @@
+# utils/tracing.py
+"""Lightweight OpenTelemetry-style request tracing.
+
+Spans are collected per trace in-process and exported when the root span
+ends, as OTLP/JSON lines (one ExportTraceServiceRequest per line) appended
+to TRACE_EXPORT_PATH, so no collector is needed; the file can be replayed
+into any OTLP-compatible backend. Tail-based sampling keeps every trace
+slower than TRACE_SLOW_MS or with an error, plus TRACE_SAMPLE_RATE of the rest.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns",
+                 "attributes", "error", "children", "_token")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        # Finished spans of the whole trace are collected on the root
+        self.children = [] if parent is None else None
+        self._token = None
+
+    @property
+    def root(self):
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def enabled():
+    return bool(config.TRACE_EXPORT_PATH)
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+def start_span(name, attributes=None, root=False):
+    """Open a span under the current one (or a new trace if root/no parent)."""
+    parent = None if root else _current.get()
+    span = Span(name, parent, attributes)
+    span._token = _current.set(span)
+    return span
+
+def end_span(span, error=None):
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = str(error)
+    try:
+        _current.reset(span._token)
+    except ValueError:
+        # Ended from a different context (e.g. a streamed response); just detach
+        _current.set(span.parent)
+    root = span.root
+    if span is root:
+        _finish_trace(root)
+    else:
+        root.children.append(span)
+
+class span:
+    """Context manager: `with span("embedding", chunks=12): ...`. No-op when tracing is off."""
+
+    def __init__(self, name, root=False, **attributes):
+        self.name = name
+        self.root = root
+        self.attributes = attributes
+        self._span = None
+
+    def __enter__(self):
+        if not enabled() or (not self.root and _current.get() is None):
+            return NOOP_SPAN
+        self._span = start_span(self.name, self.attributes, root=self.root)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is not None:
+            end_span(self._span, exc)
+        return False
+
+def _keep(root, spans):
+    if root.duration_ms() >= config.TRACE_SLOW_MS:
+        return True
+    if any(s.error for s in spans):
+        return True
+    return random.random() < config.TRACE_SAMPLE_RATE
+
+def _otlp_span(s):
+    span_json = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 2 if s.parent is None else 1,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [
+            {"key": k, "value": {"stringValue": str(v)}} for k, v in s.attributes.items()
+        ],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1}
+    }
+    if s.parent is not None:
+        span_json["parentSpanId"] = s.parent.span_id
+    return span_json
+
+def _finish_trace(root):
+    spans = [root] + root.children
+    if not _keep(root, spans):
+        return
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": config.TRACE_SERVICE_NAME}},
+            {"key": "process.pid", "value": {"stringValue": str(os.getpid())}}
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "knowledge-assistant"},
+            "spans": [_otlp_span(s) for s in spans]
+        }]
+    }]}
+    line = json.dumps(payload, separators=(",", ":")) + "\n"
+    try:
+        # One write per trace in append mode keeps lines whole across workers
+        with _export_lock, open(config.TRACE_EXPORT_PATH, "a") as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"Trace export failed: {e}")
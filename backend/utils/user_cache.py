@@ -0,0 +1,76 @@
+# utils/user_cache.py
+import threading
+import time
+from bson import ObjectId
+from config import config
+from utils.metrics import cache_event
+
+_cache = {}
+_access_cache = {}
+_lock = threading.Lock()
+
+DISPLAY_FIELDS = {"username": 1, "email": 1}
+
+def resolve_users(db, user_ids):
+    """Map user ID strings to {"username", "email"} with one $in query for cache misses."""
+    now = time.monotonic()
+    wanted = {str(uid) for uid in user_ids if uid}
+    found = {}
+    with _lock:
+        for uid in wanted:
+            entry = _cache.get(uid)
+            if entry and entry[0] > now:
+                found[uid] = entry[1]
+
+    cache_event("user_display", True, len(found))
+    cache_event("user_display", False, len(wanted) - len(found))
+
+    missing = []
+    for uid in wanted - found.keys():
+        try:
+            missing.append(ObjectId(uid))
+        except Exception:
+            continue
+
+    if missing:
+        expires = now + config.USER_CACHE_TTL
+        fetched = {
+            str(u["_id"]): {"username": u.get("username", "Unknown"), "email": u.get("email", "")}
+            for u in db.users.find({"_id": {"$in": missing}}, DISPLAY_FIELDS)
+        }
+        with _lock:
+            if len(_cache) > config.USER_CACHE_SIZE:
+                _cache.clear()
+            for uid, fields in fetched.items():
+                _cache[uid] = (expires, fields)
+        found.update(fetched)
+
+    return found
+
+def get_user_access(db, user_id):
+    """Return {"role", "is_active"} for a user, or None if it does not exist.
+
+    Cached for AUTH_CACHE_TTL so role/revocation checks stay in memory; the
+    worker that changes a user invalidates immediately, others within the TTL.
+    """
+    uid = str(user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _access_cache.get(uid)
+        if entry and entry[0] > now:
+            cache_event("user_access", True)
+            return entry[1]
+    cache_event("user_access", False)
+
+    user = db.users.find_one({"_id": ObjectId(uid)}, {"role": 1, "is_active": 1})
+    access = {"role": user.get("role"), "is_active": user.get("is_active", True)} if user else None
+    with _lock:
+        if len(_access_cache) > config.USER_CACHE_SIZE:
+            _access_cache.clear()
+        _access_cache[uid] = (now + config.AUTH_CACHE_TTL, access)
+    return access
+
+def invalidate_user(user_id):
+    with _lock:
+        _cache.pop(str(user_id), None)
+        _access_cache.pop(str(user_id), None)
@@ -0,0 +1,109 @@
+# utils/write_behind.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from pymongo.errors import BulkWriteError
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """Buffer bookkeeping writes off the response path.
+
+    Callers submit a list of (collection_name, pymongo write request) pairs.
+    A background thread drains the queue every WRITE_BEHIND_FLUSH_INTERVAL
+    seconds and issues one unordered bulk_write per collection, so the
+    durability lag is bounded by the flush interval plus one round trip.
+    Batches mix many users' writes, so one failing op must not drop the
+    rest: failed ops are retried once and any still failing are logged.
+    """
+
+    def __init__(self, db, flush_interval=None, max_batch=None, max_pending=None):
+        self.db = db
+        self.flush_interval = flush_interval or config.WRITE_BEHIND_FLUSH_INTERVAL
+        self.max_batch = max_batch or config.WRITE_BEHIND_MAX_BATCH
+        self.max_pending = max_pending or config.WRITE_BEHIND_MAX_PENDING
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def submit(self, ops):
+        if not config.WRITE_BEHIND_ENABLED:
+            self._write(ops)
+            return
+        q = self._ensure_worker()
+        try:
+            q.put_nowait(ops)
+        except queue.Full:
+            logger.warning("Write-behind queue full, writing synchronously")
+            self._write(ops)
+
+    def flush(self, timeout=5.0):
+        """Wait (up to timeout seconds) for queued writes to reach MongoDB."""
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while q.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.max_pending)
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+        return self._queue
+
+    def _run(self, q):
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write([op for ops in batch for op in ops])
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+    def _write(self, ops):
+        by_collection = {}
+        for name, op in ops:
+            by_collection.setdefault(name, []).append(op)
+        for name, requests in by_collection.items():
+            for attempt in range(2):
+                try:
+                    self.db[name].bulk_write(requests, ordered=False)
+                    break
+                except BulkWriteError as e:
+                    # Everything but the failed ops was applied; an upsert that lost a
+                    # race to insert the same _id (duplicate key) succeeds as an update
+                    errors = e.details.get("writeErrors", [])
+                    failed = [requests[err["index"]] for err in errors]
+                    if attempt or not failed:
+                        for err in errors:
+                            logger.error(f"Write-behind write to {name} dropped: "
+                                         f"{err.get('errmsg')} ({requests[err['index']]})")
+                        break
+                    requests = failed
+                except Exception as e:
+                    # Unknown how much was applied (pymongo already retried retryable
+                    # writes), and replaying $inc ops could double-count
+                    logger.error(f"Write-behind flush of {len(requests)} ops to {name} failed: {e}")
+                    break
@@ -6,6 +6,8 @@ const ChatContext = createContext(null);
 export function ChatProvider({ children }) {
   const [currentSession, setCurrentSession] = useState(null);
   const [messages, setMessages] = useState([]);
+  // Cursor to the next window of older messages in the current session
+  const [olderCursor, setOlderCursor] = useState(null);
   const [sessions, setSessions] = useState([]);
 
   const addMessage = (msg) => {
@@ -15,17 +17,20 @@ export function ChatProvider({ children }) {
   const clearSession = () => {
     setCurrentSession(null);
     setMessages([]);
+    setOlderCursor(null);
   };
 
-  const loadSession = (session, msgs) => {
+  const loadSession = (session, msgs, cursor = null) => {
     setCurrentSession(session);
     setMessages(msgs);
+    setOlderCursor(cursor);
   };
 
   return (
     <ChatContext.Provider value={{
       currentSession, setCurrentSession,
       messages, setMessages, addMessage,
+      olderCursor, setOlderCursor,
       sessions, setSessions,
       clearSession, loadSession
     }}>
@@ -46,8 +46,25 @@ function SourceCard({ source, index }) {
   );
 }
 
+function useSources(msg) {
+  // Session loads omit sources; fetch them when the user expands the list
+  const [sources, setSources] = useState(msg.sources || null);
+  const [loading, setLoading] = useState(false);
+  const load = () => {
+    if (sources || loading) return;
+    setLoading(true);
+    chatAPI.getSources(msg.id)
+      .then(res => setSources(res.data.sources))
+      .catch(() => toast.error('Failed to load sources'))
+      .finally(() => setLoading(false));
+  };
+  return { sources, loading, load };
+}
+
 function Message({ msg }) {
   const isUser = msg.role === 'user';
+  const { sources, loading: loadingSources, load: loadSources } = useSources(msg);
+  const sourceCount = sources ? sources.length : (msg.source_count || 0);
   return (
     <div style={{
       display: 'flex', justifyContent: isUser ? 'flex-end' : 'flex-start',
@@ -85,14 +102,27 @@ function Message({ msg }) {
         </div>
         
         {/* Sources */}
-        {!isUser && msg.sources && msg.sources.length > 0 && (
+        {!isUser && sourceCount > 0 && (
           <div style={{ marginTop: 10, display: 'flex', flexDirection: 'column', gap: 6 }}>
             <div style={{ fontSize: 11, color: 'var(--text-3)', fontWeight: 600, letterSpacing: '0.08em', textTransform: 'uppercase', marginBottom: 4 }}>
               Sources
             </div>
-            {msg.sources.map((src, i) => (
+            {sources ? sources.map((src, i) => (
               <SourceCard key={i} source={src} index={i + 1} />
-            ))}
+            )) : (
+              <button
+                onClick={loadSources}
+                disabled={loadingSources}
+                style={{
+                  alignSelf: 'flex-start', padding: '6px 12px', background: 'var(--bg-3)',
+                  border: '1px solid var(--border)', borderRadius: 'var(--radius-sm)',
+                  color: 'var(--text-2)', cursor: 'pointer', fontSize: 12,
+                  fontFamily: 'var(--font-display)'
+                }}
+              >
+                {loadingSources ? 'Loading...' : `Show ${sourceCount} source${sourceCount !== 1 ? 's' : ''}`}
+              </button>
+            )}
           </div>
         )}
         
@@ -109,10 +139,11 @@ function Message({ msg }) {
 export default function Chat() {
   const { sessionId } = useParams();
   const navigate = useNavigate();
-  const { currentSession, setCurrentSession, messages, setMessages } = useChat();
+  const { currentSession, setCurrentSession, messages, setMessages, olderCursor, setOlderCursor, loadSession } = useChat();
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [loadingSession, setLoadingSession] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
 
@@ -120,17 +151,23 @@ export default function Chat() {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  useEffect(() => { scrollToBottom(); }, [messages]);
+  const keepScrollRef = useRef(false);
+
+  useEffect(() => {
+    // Prepending older messages should not jump to the bottom
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
+    scrollToBottom();
+  }, [messages]);
 
   // Load existing session
   useEffect(() => {
     if (sessionId && (!currentSession || currentSession.id !== sessionId)) {
       setLoadingSession(true);
       chatAPI.getSession(sessionId)
-        .then(res => {
-          setCurrentSession(res.data.session);
-          setMessages(res.data.messages);
-        })
+        .then(res => loadSession(res.data.session, res.data.messages, res.data.next_cursor))
         .catch(() => {
           toast.error('Session not found');
           navigate('/chat');
@@ -139,6 +176,19 @@ export default function Chat() {
     }
   }, [sessionId]);
 
+  const loadOlder = () => {
+    if (!currentSession || !olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    chatAPI.getSession(currentSession.id, olderCursor)
+      .then(res => {
+        keepScrollRef.current = true;
+        setMessages(prev => [...res.data.messages, ...prev]);
+        setOlderCursor(res.data.next_cursor);
+      })
+      .catch(() => toast.error('Failed to load earlier messages'))
+      .finally(() => setLoadingOlder(false));
+  };
+
   const handleSend = async () => {
     const question = input.trim();
     if (!question || loading) return;
@@ -276,6 +326,13 @@ export default function Chat() {
             </div>
           ) : (
             <>
+              {olderCursor && (
+                <div style={{ display: 'flex', justifyContent: 'center', marginBottom: 20 }}>
+                  <button className="btn btn-ghost btn-sm" onClick={loadOlder} disabled={loadingOlder}>
+                    {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                  </button>
+                </div>
+              )}
               {messages.map((msg) => (
                 <Message key={msg.id} msg={msg} />
               ))}
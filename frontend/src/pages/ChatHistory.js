@@ -20,7 +20,7 @@ export default function ChatHistory() {
   const [sessions, setSessions] = useState([]);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
-  const { setCurrentSession, setMessages } = useChat();
+  const { loadSession } = useChat();
 
   useEffect(() => {
     chatAPI.listSessions()
@@ -32,8 +32,7 @@ export default function ChatHistory() {
   const handleOpen = async (session) => {
     try {
       const res = await chatAPI.getSession(session.id);
-      setCurrentSession(res.data.session);
-      setMessages(res.data.messages);
+      loadSession(res.data.session, res.data.messages, res.data.next_cursor);
       navigate(`/chat/${session.id}`);
     } catch {
       toast.error('Failed to load session');
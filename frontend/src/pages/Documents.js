@@ -4,7 +4,7 @@ import Navbar from '../components/Navbar';
 import { documentsAPI } from '../services/api';
 import toast from 'react-hot-toast';
 
-function StatusBadge({ status }) {
+function StatusBadge({ status, stage, progress }) {
   const map = {
     ready: ['badge-green', '✓ Ready'],
     processing: ['badge-yellow', '⟳ Processing'],
@@ -12,6 +12,10 @@ function StatusBadge({ status }) {
     disabled: ['badge-gray', '⊘ Disabled'],
   };
   const [cls, label] = map[status] || ['badge-gray', status];
+  if (status === 'processing' && stage) {
+    const detail = progress ? `${stage} ${progress.done}/${progress.total}` : stage;
+    return <span className={`badge ${cls}`}>⟳ {detail.charAt(0).toUpperCase() + detail.slice(1)}</span>;
+  }
   return <span className={`badge ${cls}`}>{label}</span>;
 }
 
@@ -31,8 +35,9 @@ export default function Documents() {
   const [uploading, setUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
   const [dragging, setDragging] = useState(false);
-  const [pollingIds, setPollingIds] = useState(new Set());
   const fileInputRef = useRef();
+  const replaceInputRef = useRef();
+  const [replaceTarget, setReplaceTarget] = useState(null);
 
   const fetchDocs = useCallback(async () => {
     try {
@@ -47,47 +52,55 @@ export default function Documents() {
 
   useEffect(() => { fetchDocs(); }, [fetchDocs]);
 
-  // Poll processing documents
-  useEffect(() => {
-    const processingDocs = documents.filter(d => d.status === 'processing');
-    if (processingDocs.length === 0) return;
+  // Stream status changes while anything is processing
+  const hasProcessing = documents.some(d => d.status === 'processing');
+  const documentsRef = useRef(documents);
+  documentsRef.current = documents;
 
-    let attempts = {};
+  useEffect(() => {
+    if (!hasProcessing) return;
+    const source = new EventSource(documentsAPI.eventsUrl());
 
-    const interval = setInterval(async () => {
-      for (const doc of processingDocs) {
-        attempts[doc.id] = (attempts[doc.id] || 0) + 1;
+    source.addEventListener('status', (e) => {
+      const event = JSON.parse(e.data);
+      const doc = documentsRef.current.find(d => d.id === event.document_id);
+      if (!doc) return;
+      setDocuments(prev => prev.map(d =>
+        d.id === event.document_id
+          ? { ...d, status: event.status, stage: event.stage, progress: event.progress,
+              chunk_count: event.chunk_count, error_message: event.error_message }
+          : d
+      ));
+      if (doc.status === 'processing' && event.last_replace && event.status !== 'processing' && !event.error_message) {
+        const { reused, recomputed } = event.last_replace;
+        toast.success(`"${doc.original_name}" updated: ${reused} chunks reused, ${recomputed} re-embedded`);
+        // Name and size change with the new revision
+        documentsAPI.get(event.document_id)
+          .then(res => setDocuments(prev => prev.map(d => d.id === event.document_id ? res.data.document : d)))
+          .catch(() => {});
+      } else if (doc.status === 'processing' && event.status === 'ready' && !event.error_message) {
+        toast.success(`"${doc.original_name}" is ready!`);
+      } else if (doc.status === 'processing' && event.status !== 'processing' && event.error_message) {
+        toast.error(`"${doc.original_name}" processing failed`);
+      }
+    });
 
-        // Stop polling after 20 attempts (1 minute)
-        if (attempts[doc.id] > 20) {
-          setDocuments(prev => prev.map(d =>
-            d.id === doc.id && d.status === 'processing'
-              ? { ...d, status: 'error', error_message: 'Processing timeout' }
-              : d
-          ));
-          continue;
-        }
+    // Safety net for events this stream cannot see (another worker, dropped connection)
+    let poll = setInterval(fetchDocs, 20000);
 
-        try {
-          const res = await documentsAPI.checkStatus(doc.id);
-          if (res.data.status !== 'processing') {
-            setDocuments(prev => prev.map(d =>
-              d.id === doc.id
-                ? { ...d, status: res.data.status, chunk_count: res.data.chunk_count, error_message: res.data.error_message }
-                : d
-            ));
-            if (res.data.status === 'ready') {
-              toast.success(`"${doc.original_name}" is ready!`);
-            } else if (res.data.status === 'error') {
-              toast.error(`"${doc.original_name}" processing failed`);
-            }
-          }
-        } catch {}
+    // A refused stream (e.g. 503, all stream slots busy) is not retried by EventSource; poll instead
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        clearInterval(poll);
+        poll = setInterval(fetchDocs, 3000);
       }
-    }, 3000);
+    };
 
-    return () => clearInterval(interval);
-  }, [documents]);
+    return () => {
+      source.close();
+      clearInterval(poll);
+    };
+  }, [hasProcessing, fetchDocs]);
 
   const handleUpload = async (file) => {
     if (!file) return;
@@ -120,6 +133,61 @@ export default function Documents() {
     }
   };
 
+  const handleFiles = (fileList) => {
+    const files = Array.from(fileList || []);
+    if (files.length === 0) return;
+    if (files.length === 1 && !files[0].name.toLowerCase().endsWith('.zip')) {
+      handleUpload(files[0]);
+    } else {
+      handleBulkUpload(files);
+    }
+  };
+
+  const handleBulkUpload = async (files) => {
+    const formData = new FormData();
+    files.forEach(f => formData.append('files', f));
+
+    setUploading(true);
+    setUploadProgress(0);
+
+    try {
+      const res = await documentsAPI.uploadBulk(formData, setUploadProgress);
+      setDocuments(prev => [...res.data.documents, ...prev]);
+      toast.success(`${res.data.documents.length} documents uploaded! Processing...`);
+      if (res.data.rejected.length > 0) {
+        toast.error(`${res.data.rejected.length} file(s) skipped: ${res.data.rejected.map(r => r.name).slice(0, 3).join(', ')}`);
+      }
+    } catch (err) {
+      toast.error(err.response?.data?.error || 'Upload failed');
+    } finally {
+      setUploading(false);
+      setUploadProgress(0);
+      if (fileInputRef.current) fileInputRef.current.value = '';
+    }
+  };
+
+  const handleReplace = async (file) => {
+    const doc = replaceTarget;
+    setReplaceTarget(null);
+    if (replaceInputRef.current) replaceInputRef.current.value = '';
+    if (!doc || !file) return;
+    const ext = file.name.split('.').pop().toLowerCase();
+    if (!['pdf', 'txt'].includes(ext)) {
+      toast.error('Only PDF and TXT files are allowed');
+      return;
+    }
+
+    const formData = new FormData();
+    formData.append('file', file);
+    try {
+      const res = await documentsAPI.replace(doc.id, formData);
+      setDocuments(prev => prev.map(d => d.id === doc.id ? res.data.document : d));
+      toast.success('New revision uploaded! Processing...');
+    } catch (err) {
+      toast.error(err.response?.data?.error || 'Replace failed');
+    }
+  };
+
   const handleDelete = async (doc) => {
     if (!window.confirm(`Delete "${doc.original_name}"?`)) return;
     try {
@@ -134,8 +202,7 @@ export default function Documents() {
   const handleDrop = (e) => {
     e.preventDefault();
     setDragging(false);
-    const file = e.dataTransfer.files[0];
-    if (file) handleUpload(file);
+    handleFiles(e.dataTransfer.files);
   };
 
   return (
@@ -171,9 +238,18 @@ export default function Documents() {
           <input
             ref={fileInputRef}
             type="file"
+            accept=".pdf,.txt,.zip"
+            multiple
+            style={{ display: 'none' }}
+            onChange={e => handleFiles(e.target.files)}
+          />
+          <input
+            ref={replaceInputRef}
+            type="file"
             accept=".pdf,.txt"
             style={{ display: 'none' }}
-            onChange={e => handleUpload(e.target.files[0])}
+            onClick={e => e.stopPropagation()}
+            onChange={e => handleReplace(e.target.files[0])}
           />
           
           {uploading ? (
@@ -198,10 +274,10 @@ export default function Documents() {
                 </svg>
               </div>
               <div style={{ fontWeight: 700, color: 'var(--text-0)', marginBottom: 6 }}>
-                {dragging ? 'Drop it here!' : 'Drop file or click to upload'}
+                {dragging ? 'Drop it here!' : 'Drop files or click to upload'}
               </div>
               <div style={{ fontSize: 13, color: 'var(--text-3)' }}>
-                PDF and TXT files — max 16MB
+                PDF and TXT files (or a ZIP of them) — max 16MB per file
               </div>
             </>
           )}
@@ -256,7 +332,19 @@ export default function Documents() {
                   )}
                 </div>
                 
-                <StatusBadge status={doc.status} />
+                <StatusBadge status={doc.status} stage={doc.stage} progress={doc.progress} />
+                
+                <button
+                  onClick={() => { setReplaceTarget(doc); replaceInputRef.current?.click(); }}
+                  disabled={doc.status === 'processing'}
+                  className="btn btn-ghost btn-sm"
+                  style={{ color: 'var(--text-3)', border: 'none', padding: '6px 8px' }}
+                  title="Upload new revision"
+                >
+                  <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2">
+                    <polyline points="23 4 23 10 17 10"/><path d="M20.49 15a9 9 0 1 1-2.12-9.36L23 10"/>
+                  </svg>
+                </button>
                 
                 <button
                   onClick={() => handleDelete(doc)}
@@ -46,17 +46,34 @@ export const documentsAPI = {
       if (onProgress) onProgress(Math.round((e.loaded * 100) / e.total));
     }
   }),
+  uploadBulk: (formData, onProgress) => api.post('/documents/upload/bulk', formData, {
+    headers: { 'Content-Type': 'multipart/form-data' },
+    timeout: 600000,
+    onUploadProgress: (e) => {
+      if (onProgress) onProgress(Math.round((e.loaded * 100) / e.total));
+    }
+  }),
+  replace: (id, formData, onProgress) => api.put(`/documents/${id}/replace`, formData, {
+    headers: { 'Content-Type': 'multipart/form-data' },
+    onUploadProgress: (e) => {
+      if (onProgress) onProgress(Math.round((e.loaded * 100) / e.total));
+    }
+  }),
   list: (page = 1, limit = 20) => api.get(`/documents/list?page=${page}&limit=${limit}`),
   get: (id) => api.get(`/documents/${id}`),
   delete: (id) => api.delete(`/documents/${id}`),
   checkStatus: (id) => api.get(`/documents/${id}/status`),
+  // EventSource cannot send headers, so the token goes in the query string
+  eventsUrl: () => `${API_BASE}/documents/events?jwt=${encodeURIComponent(localStorage.getItem('ka_token') || '')}`,
 };
 
 // Chat
 export const chatAPI = {
   ask: (data) => api.post('/chat/ask', data),
   listSessions: (page = 1) => api.get(`/chat/sessions?page=${page}`),
-  getSession: (id) => api.get(`/chat/sessions/${id}`),
+  getSession: (id, cursor) => api.get(`/chat/sessions/${id}${cursor ? `?cursor=${cursor}` : ''}`),
+  getSources: (messageId) => api.get(`/chat/messages/${messageId}/sources`),
+  exportSession: (id) => api.get(`/chat/sessions/${id}/export`, { responseType: 'blob' }),
   deleteSession: (id) => api.delete(`/chat/sessions/${id}`),
   history: () => api.get('/chat/history'),
 };